@@ -1,187 +1,183 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sentence_transformers import SentenceTransformer
-from sqlalchemy import text, func
-from app.database.connection import get_db
-from app.models import Store, Brand
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_async_db, SessionLocal
 from app.services.recommend_service import HybridRecommender
-from geoalchemy2.functions import ST_DWithin, ST_SetSRID, ST_MakePoint, ST_Distance
-from geoalchemy2 import Geometry
-from geoalchemy2.shape import to_shape
-import logging
-from app.services.collect_user_data import collect_user_data
-from collections import defaultdict
-from app.database.redis_client import r
+from app.services.score_fusion import HYBRID_ALS_WEIGHT, HYBRID_VECTOR_WEIGHT, HYBRID_NORMALIZATION
 import json
-from app.database.es import es
+import logging
+import os
+from app.services.batch_recommend import BATCH_RECOMMEND_MAX_USERS, recommend_users
+from app.services.collect_user_data import UserDataCollectionError, acollect_user_data
+from app.services.popularity import start_popularity_refresh
+from app.services.scheduler import PeriodicTask
+from app.services.store_retrieval import asearch_nearby_stores, ensure_store_ann_index
+from app.services.store_catalog import store_catalog, start_store_catalog_refresh, afetch_recommendation_items
+from app.services.user_vector_cache import aget_or_encode_user_vector, ainvalidate_user_vector
+from app.services.recommend_cache import (
+    RECOMMEND_BRAND_TTL, RECOMMEND_STORE_TTL, geohash, nearby_result_key,
+    aget_cached, aset_user_result, aget_brand_list, aset_brand_list,
+    ainvalidate_user_results, cache_stats
+)
+from app.database.es import aes
 
 
 router = APIRouter()
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 recommender = HybridRecommender()
 logger = logging.getLogger(__name__)
 
-def get_min_rank(benefits: list) -> str:
-    for b in benefits:
-        if b.rank != "NONE":
-            return b.rank
-    return "NONE"
+ALS_RETRAIN_INTERVAL = int(os.getenv("ALS_RETRAIN_INTERVAL", "3600"))
+ALS_RELOAD_INTERVAL = int(os.getenv("ALS_RELOAD_INTERVAL", "60"))
+
+async def collect_profile_text(user_id: int) -> tuple[str, bool]:
+    # 반환: (프로필 텍스트, 모든 소스 조회 성공 여부)
+    # 모든 소스가 실패하면 정보 부족(404)이 아니라 503으로 응답
+    try:
+        (categories, histories, bookmarks, clicks, searches), complete = await acollect_user_data(user_id, aes)
+    except UserDataCollectionError as e:
+        raise HTTPException(status_code=503, detail="사용자 정보를 조회할 수 없습니다.") from e
 
-def extract_lat_lng(store):
-    if store.location is None:
-        return None, None
-    point = to_shape(store.location)
-    return point.y, point.x
+    if not (categories or histories or bookmarks or clicks or searches):
+        if not complete:
+            raise HTTPException(status_code=503, detail="사용자 정보를 조회할 수 없습니다.")
+        raise HTTPException(status_code=404, detail="사용자 정보가 부족합니다.")
+    return "; ".join(categories + histories + bookmarks + clicks + searches), complete
 
 @router.get("/recommend")
-def recommend(
+async def recommend(
     user_id:int, 
     lat: float = Query(...),
     lng: float = Query(...),
     radius_km: float = Query(2.0),
-    db:Session = Depends(get_db)
+    strategy: str = Query("auto", pattern="^(auto|exact|ann)$"),
+    db: AsyncSession = Depends(get_async_db)
     ):
 
-    # 1. 사용자 정보 수집
-    categories, histories, bookmarks, clicks, searches = collect_user_data(user_id, db, es)
+    # 0. Redis 캐시 확인 (사용자 + 검색 전략 + geohash 셀 + 반경)
+    cache_key = nearby_result_key(user_id, geohash(lat, lng), radius_km, strategy)
+    cached = await aget_cached("nearby", cache_key)
+    if cached is not None:
+        return cached
 
-    if not (categories or histories or bookmarks or clicks or searches):
-        raise HTTPException(status_code=404, detail="사용자 정보가 부족합니다.")
+    # 1. 사용자 정보 수집 (일부 소스가 실패했으면 벡터와 결과를 캐시하지 않음)
+    user_profile_text, complete = await collect_profile_text(user_id)
 
-    # 2. 텍스트 통합 후 임베딩
-    user_profile_text = "; ".join(categories + histories + bookmarks + clicks + searches)
-    user_vec = model.encode(user_profile_text).tolist()
+    # 2. 텍스트 통합 후 임베딩 (프로필 입력이 같으면 캐시된 벡터 사용)
+    user_vec = (await aget_or_encode_user_vector(user_id, user_profile_text, cache=complete)).tolist()
 
     # 3. pgvector를 활용한 유사도 계산
-    sql = text("""
-        WITH click_counts AS (
-        SELECT store_id, COUNT(*) AS click_count
-        FROM store_click_log
-        GROUP BY store_id
-        ),
-        click_stats AS (
-            SELECT MAX(click_count) AS max_clicks,
-                MIN(click_count) AS min_clicks
-            FROM click_counts
-        )
-        SELECT s.id, s.name, s.address,
-            1 - (embedding <-> CAST(:user_vec AS vector)) AS similarity,
-            COALESCE(cc.click_count, 0) AS click_score,
-            (SELECT COUNT(*) FROM usage_history WHERE store_id = s.id) AS visit_score,
-            CASE 
-                WHEN cs.max_clicks > cs.min_clicks THEN 
-                    (COALESCE(cc.click_count, 0) - cs.min_clicks)::float / NULLIF(cs.max_clicks - cs.min_clicks, 0)
-                ELSE 0
-            END AS normalized_click_score
-        FROM store_embedding se
-        JOIN store s ON se.store_id = s.id
-        LEFT JOIN click_counts cc ON cc.store_id = s.id
-        CROSS JOIN click_stats cs
-        WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
-        ORDER BY 0.7 * (1 - (embedding <-> CAST(:user_vec AS vector))) + 0.3 * (
-            CASE 
-                WHEN cs.max_clicks > cs.min_clicks THEN 
-                    (COALESCE(cc.click_count, 0) - cs.min_clicks)::float / NULLIF(cs.max_clicks - cs.min_clicks, 0)
-                ELSE 0
-            END
-        ) DESC
-        LIMIT 10
-    """)
-
-    results = db.execute(sql, {
-        "user_vec": user_vec,
-        "lat": lat,
-        "lng": lng,
-        "radius": radius_km * 1000
-    }).mappings().all()
-
-    return {"top10": results}
+    # 반경 내 후보가 적으면 정확 계산, 많으면 HNSW 후보 추출 후 인기도와 섞어 재정렬
+    _, results = await asearch_nearby_stores(db, user_vec, lat, lng, radius_km * 1000, strategy)
+
+    final_results = {"top10": results}
+    if complete:
+        await aset_user_result(user_id, "nearby", cache_key, RECOMMEND_STORE_TTL, final_results)
+    return final_results
 
 @router.on_event("startup")
 def startup_event():
-    with next(get_db()) as db:
+    start_popularity_refresh()
+    start_store_catalog_refresh()
+    ensure_store_ann_index()
+    # 저장된 모델로 바로 서빙하고, 학습은 백그라운드에서 주기적으로 수행
+    recommender.load_persisted_model()
+    als_trainer.start()
+    als_reloader.start()
+
+def train_als_model():
+    with SessionLocal() as db:
         recommender.train_model(db)
 
+als_trainer = PeriodicTask("als-train", ALS_RETRAIN_INTERVAL, train_als_model)
+# 다른 워커가 학습했거나 롤백으로 CURRENT 버전이 바뀌면 다시 로드
+als_reloader = PeriodicTask(
+    "als-reload", ALS_RELOAD_INTERVAL, recommender.load_persisted_model, run_immediately=False
+)
+
 @router.get("/recommend/hybrid")
-def hybrid_recommend(
+async def hybrid_recommend(
     user_id: int, 
     lat: float = Query(37.5),
     lng: float = Query(127.04),
     radius_km: float = Query(2.0),
-    db: Session = Depends(get_db)
+    als_weight: float | None = Query(None, ge=0),
+    vector_weight: float | None = Query(None, ge=0),
+    normalization: str | None = Query(None, pattern="^(minmax|zscore|rank)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
 
-    # 0. Redis 캐시 확인
-    cache_key = f"recommendation:user:{user_id}"
-    try:
-        cached = r.get(cache_key)
-        if cached:
-            return json.loads(cached)
-    except Exception as e:
-        logger.error(f"Redis 캐시 확인 중 오류: {e}")
-
-    # 1. 사용자 텍스트 정보 수집
-    categories, histories, bookmarks, clicks, searches = collect_user_data(user_id, db, es)
-
-    if not (categories or histories or bookmarks or clicks or searches):
-        raise HTTPException(status_code=404, detail="사용자 정보가 부족합니다.")
-
-    # 2. 벡터 생성
-    user_profile_text = "; ".join(categories + histories + bookmarks + clicks + searches)
-    user_vec = model.encode(user_profile_text).tolist()
+    # 점수 결합 방식을 요청에서 바꾸면 기본 설정으로 계산된 캐시는 읽지도 저장하지도 않음
+    use_cache = als_weight is None and vector_weight is None and normalization is None
+
+    # 0. 위치와 무관한 추천 브랜드 순위 캐시 확인 (매장은 요청 위치 기준으로 매번 조회)
+    results = await aget_brand_list(user_id) if use_cache else None
+    if results is None:
+        # 1. 사용자 텍스트 정보 수집 (일부 소스가 실패했으면 벡터와 브랜드 순위를 캐시하지 않음)
+        user_profile_text, complete = await collect_profile_text(user_id)
+
+        # 2. 벡터 생성 (프로필 입력이 같으면 캐시된 벡터 사용)
+        user_vec = (await aget_or_encode_user_vector(user_id, user_profile_text, cache=complete)).tolist()
+
+        # 3. 추천 결과 계산
+        # ALS 모델이 아직 없으면(첫 학습 전) 임베딩 점수만의 순위이므로 캐시하지 않음
+        als_ready = recommender.state is not None
+        # fold-in 상호작용과 브랜드 행렬 갱신은 비동기로 조회하고 점수 계산만 CPU 전용 스레드에서 실행
+        hybrid_scores = await recommender.aget_hybrid_scores(
+            db, user_id, user_vec,
+            als_weight=HYBRID_ALS_WEIGHT if als_weight is None else als_weight,
+            vector_weight=HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight,
+            normalization=normalization or HYBRID_NORMALIZATION
+        )
+        results = [[int(brand_id), float(score)] for brand_id, score in hybrid_scores]
+        if use_cache and als_ready and complete:
+            await aset_brand_list(user_id, results, RECOMMEND_BRAND_TTL)
 
-    # 3. 추천 결과 계산
-    results = recommender.get_hybrid_scores(db, user_id, user_vec)
-    recommended_brand_ids = [brand_id for brand_id, _ in results]
     logger.debug(f"Recommendation results for user {user_id}: {results}")
 
-    # 4. 위치 기반 필터링: 추천 브랜드 매장 중 반경 km 이내
-    store_query = db.query(Store).options(
-        joinedload(Store.brand).joinedload(Brand.category),
-        joinedload(Store.brand).joinedload(Brand.benefits)
-    ).filter(
-        Store.brand_id.in_(recommended_brand_ids),
-        func.ST_DWithin(Store.location, func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), radius_km * 1000)
-    ).order_by(
-        func.ST_Distance(Store.location, func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326))
-    ).all()
-
-    # 매장 중 하나씩 결과 연결
-    store_map = {}
-    brand_store_map = defaultdict(list)
-    for store in store_query:
-        brand_store_map[store.brand_id].append(store)
-    store_map = {bid: stores[0] for bid, stores in brand_store_map.items()}
-
-    # 5. 결과 구성
-    recommendation_items = []
-    for brand_id, score in results:
-        if brand_id not in store_map:
-            continue
-        store = store_map[brand_id]
-        brand = store.brand
-        lat, lng = extract_lat_lng(store)
-
-        item = {
-            "storeId": store.id,
-            "brandId": brand.id,
-            "name": store.name,
-            "latitude": lat,
-            "longitude": lng,
-            "category": brand.category.name if brand.category else None,
-            "description": brand.description,
-            "isVIPcock": brand.rank_type in ("VIP", "VIP_NORMAL"),
-            "minRank": get_min_rank(brand.benefits),
-            "imgUrl": brand.image_url
-        }
-        recommendation_items.append(item)
+    # 4. 위치 기반 필터링: 추천 브랜드별 반경 내 가장 가까운 매장
+    # 메모리 매장 카탈로그로 조회하고, 아직 적재되지 않았으면 브랜드당 1건만 DB에서 조회
+    recommendation_items = store_catalog.recommendation_items(results, lat, lng, radius_km * 1000)
+    if recommendation_items is None:
+        recommendation_items = await afetch_recommendation_items(db, results, lat, lng, radius_km * 1000)
     final_results = {"recommendationsList": recommendation_items}
 
-    # 6. 캐시 저장 (1시간)
+    # 5. 결과 반환
+    return final_results
+
+class BatchUser(BaseModel):
+    userId: int
+    lat: float
+    lng: float
+
+class BatchRecommendRequest(BaseModel):
+    # 요청 전체를 메모리에 올리고 동기 세션 하나로 처리하므로 사용자 수 상한을 둠
+    users: list[BatchUser] = Field(..., min_length=1, max_length=BATCH_RECOMMEND_MAX_USERS)
+    radiusKm: float = Field(2.0, gt=0)
+
+@router.post("/recommend/hybrid/batch")
+def hybrid_recommend_batch(request: BatchRecommendRequest):
+    # 캠페인용 다건 추천: 사용자 정보 일괄 조회 -> 배치 인코딩 -> 행렬 연산 채점
+    # 결과는 사용자 한 명당 한 줄(NDJSON)로 계산되는 대로 스트리밍 (캐시는 읽거나 쓰지 않음)
+    requests = [(user.userId, user.lat, user.lng) for user in request.users]
+    lines = recommend_users(requests, request.radiusKm, state=recommender.state)
+    return StreamingResponse(
+        (json.dumps(line, ensure_ascii=False) + "\n" for line in lines),
+        media_type="application/x-ndjson"
+    )
+
+@router.delete("/recommend/cache/{user_id}")
+async def invalidate_recommendation_cache(user_id: int):
+    # 사용자 활동(카테고리/이용내역/즐겨찾기/클릭/검색) 변경 시 호출
     try:
-        r.setex(cache_key, 3600, json.dumps(final_results))
+        await ainvalidate_user_vector(user_id)
+        await ainvalidate_user_results(user_id)
+        recommender.foldin_cache.invalidate(user_id)
     except Exception as e:
-        logger.error(f"Redis 캐싱 실패: {e}")
+        logger.error(f"추천 캐시 무효화 실패 (user_id: {user_id}): {e}")
+        raise HTTPException(status_code=503, detail="캐시 무효화에 실패했습니다.") from e
+    return {"message": f"user {user_id} cache invalidated"}
 
-    # 7. 결과 반환
-    return final_results
+@router.get("/recommend/cache/stats")
+async def recommendation_cache_stats():
+    return cache_stats.snapshot()
@@ -1,73 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
-from sentence_transformers import SentenceTransformer
-from app.database.connection import get_db
-from app.models import Store, Brand, StoreEmbedding, BrandEmbedding
+from sqlalchemy import or_, text
+from sqlalchemy.dialects.postgresql import insert
+from app.database.connection import engine, get_db
+from app.models import Store, Brand, Category, StoreEmbedding, BrandEmbedding
+from app.services.brand_index import brand_index
+from app.services.embedding_service import EMBEDDING_BATCH_SIZE, build_brand_text, encode_texts, is_stale
 from datetime import datetime
+import os
+import logging
 
 router = APIRouter()
-
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+logger = logging.getLogger(__name__)
+
+STORE_VECTOR_CHUNK_SIZE = int(os.getenv("STORE_VECTOR_CHUNK_SIZE", "1000"))
+
+# 테이블 기본 키는 (id, store_id) 복합 키라서 ON CONFLICT (store_id) 에 필요한 unique index를 기동 시 한 번 생성
+# 이름과 무관하게 store_id 단일 컬럼 unique index(또는 unique 제약)가 이미 있으면 건너뜀
+STORE_EMBEDDING_UNIQUE_INDEX_EXISTS_SQL = text("""
+    SELECT EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'store_embedding'::regclass
+            AND i.indisunique AND i.indnatts = 1 AND i.indpred IS NULL
+            AND a.attname = 'store_id'
+    )
+""")
+
+# 인덱스 생성 전 매장당 가장 최근 임베딩 한 건만 남김
+DEDUPE_STORE_EMBEDDING_SQL = text("""
+    DELETE FROM store_embedding
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY store_id ORDER BY updated_at DESC NULLS LAST, id DESC
+            ) AS rn
+            FROM store_embedding
+        ) ranked
+        WHERE rn > 1
+    )
+""")
+
+CREATE_STORE_EMBEDDING_UNIQUE_INDEX_SQL = text("""
+    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS store_embedding_store_id_key
+    ON store_embedding (store_id)
+""")
+
+@router.on_event("startup")
+def ensure_store_embedding_unique_index():
+    # CONCURRENTLY는 트랜잭션 밖에서만 실행되므로 autocommit 커넥션 사용 (생성 중에도 읽기/쓰기 가능)
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if conn.execute(STORE_EMBEDDING_UNIQUE_INDEX_EXISTS_SQL).scalar():
+                return
+            deleted = conn.execute(DEDUPE_STORE_EMBEDDING_SQL).rowcount
+            if deleted:
+                logger.warning(f"중복 매장 임베딩 {deleted}건 삭제 후 store_id unique index 생성")
+            conn.execute(CREATE_STORE_EMBEDDING_UNIQUE_INDEX_SQL)
+    except Exception as e:
+        logger.error(f"store_embedding store_id unique index 생성 실패: {e}")
 
 @router.post("/vectors/store")
-def generate_store_vectors(db: Session = Depends(get_db)):
-    try:
-        stores = (
-            db.query(Store)
-            .join(Store.brand)
-            .filter(Store.brand.has(Brand.description.isnot(None)))
-            .options(joinedload(Store.brand).joinedload(Brand.category))
-            .all()
+def generate_store_vectors(
+    batch_size: int = Query(EMBEDDING_BATCH_SIZE, ge=1),
+    incremental: bool = Query(False),
+    chunk_size: int = Query(STORE_VECTOR_CHUNK_SIZE, ge=1),
+    start_after_id: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    # 매장 id 기준 keyset 페이지네이션으로 청크 단위 조회 -> 임베딩 -> upsert -> 커밋
+    # 실패 시 응답의 last_store_id를 start_after_id로 넘기면 이어서 처리 가능
+    base_query = (
+        db.query(Store.id, Brand.name, Brand.description, Category.name)
+        .join(Brand, Store.brand_id == Brand.id)
+        .outerjoin(Category, Brand.category_id == Category.id)
+        .filter(Brand.description.isnot(None), Store.id > start_after_id)
+    )
+    query = base_query
+    if incremental:
+        # 임베딩이 없거나 브랜드/카테고리 수정 이후 갱신되지 않은 매장만 처리
+        query = query.outerjoin(StoreEmbedding, StoreEmbedding.store_id == Store.id).filter(
+            or_(
+                StoreEmbedding.updated_at.is_(None),
+                Brand.modified_at > StoreEmbedding.updated_at,
+                Category.modified_at > StoreEmbedding.updated_at
+            )
         )
+
+    try:
+        total = base_query.count()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database query failed: {str(e)}") from e
-    count = 0
 
-    embeddings_to_update = []
-    embeddings_to_insert = []
-
-    store_ids = [store.id for store in stores]
-    existing_embeddings = {
-        emb.store_id: emb for emb in 
-        db.query(StoreEmbedding).filter(StoreEmbedding.store_id.in_(store_ids)).all()
+    count = 0
+    chunks = 0
+    last_store_id = start_after_id
+    text_cache = {}
+
+    while True:
+        try:
+            rows = query.filter(Store.id > last_store_id).order_by(Store.id).limit(chunk_size).all()
+            if not rows:
+                break
+
+            # 같은 브랜드 매장은 텍스트가 같으므로 청크 간에도 인코딩 결과를 재사용
+            texts = [
+                build_brand_text(brand_name, description, category_name)
+                for _, brand_name, description, category_name in rows
+            ]
+            vectors = encode_texts(texts, batch_size, cache=text_cache)
+
+            now = datetime.utcnow()
+            stmt = insert(StoreEmbedding).values([
+                {"store_id": store_id, "embedding": vec.tolist(), "updated_at": now}
+                for (store_id, *_), vec in zip(rows, vectors)
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StoreEmbedding.store_id],
+                set_={"embedding": stmt.excluded.embedding, "updated_at": stmt.excluded.updated_at}
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"매장 임베딩 청크 처리 실패 (last_store_id: {last_store_id}): {e}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Store vector chunk failed after store_id {last_store_id}: {str(e)}"
+            ) from e
+
+        count += len(rows)
+        chunks += 1
+        last_store_id = rows[-1][0]
+        logger.info(f"매장 임베딩 진행: {count}/{total} (chunk {chunks}, last_store_id: {last_store_id})")
+
+    return {
+        "message": f"{count} store vectors created or updated",
+        "updated": count,
+        "skipped": total - count,
+        "chunks": chunks,
+        "last_store_id": last_store_id
     }
 
-    for store in stores:
-        brand = store.brand
-
-        category_name = brand.category.name if brand.category else ""
-        combined_text = f"{brand.name or ''}. {brand.description or ''}. {category_name}"
-
-        vec = model.encode(combined_text).tolist()
-
-        existing = existing_embeddings.get(store.id)
-
-        if existing:
-            embeddings_to_update.append({
-                'id': existing.id,
-                'store_id': store.id,
-                'embedding': vec,
-                'updated_at': datetime.utcnow()
-            })
-        else:
-            embeddings_to_insert.append(StoreEmbedding(
-                store_id=store.id,
-                embedding=vec,
-                updated_at=datetime.utcnow()
-            ))
-        count += 1
-
-    if embeddings_to_update:
-        db.bulk_update_mappings(StoreEmbedding, embeddings_to_update)
-    if embeddings_to_insert:
-        db.bulk_save_objects(embeddings_to_insert)
-
-    db.commit()
-    return {"message": f"{count} store vectors created or updated"}
-
 @router.post("/vectors/brand")
-def generate_brand_vectors(db: Session = Depends(get_db)):
+def generate_brand_vectors(
+    batch_size: int = Query(EMBEDDING_BATCH_SIZE, ge=1),
+    incremental: bool = Query(False),
+    db: Session = Depends(get_db)
+):
     try:
         brands = (
             db.query(Brand)
@@ -89,12 +170,26 @@ def generate_brand_vectors(db: Session = Depends(get_db)):
         db.query(BrandEmbedding).filter(BrandEmbedding.brand_id.in_(brand_ids)).all()
     }
 
-    for brand in brands:
-        category_name = brand.category.name if brand.category else ""
-        combined_text = f"{brand.name or ''}. {brand.description or ''}. {category_name}"
-
-        vec = model.encode(combined_text).tolist()
-
+    total = len(brands)
+    if incremental:
+        brands = [
+            brand for brand in brands
+            if is_stale(
+                existing_embeddings.get(brand.id),
+                brand.modified_at,
+                brand.category.modified_at if brand.category else None
+            )
+        ]
+    skipped = total - len(brands)
+
+    texts = [
+        build_brand_text(brand.name, brand.description, brand.category.name if brand.category else "")
+        for brand in brands
+    ]
+    vectors = encode_texts(texts, batch_size)
+
+    for brand, vec in zip(brands, vectors):
+        vec = vec.tolist()
         existing = existing_embeddings.get(brand.id)
 
         if existing:
@@ -118,6 +213,8 @@ def generate_brand_vectors(db: Session = Depends(get_db)):
         db.bulk_save_objects(embeddings_to_insert)
 
     db.commit()
-    return {"message": f"{count} brand vectors created or updated"}
+    if count:
+        brand_index.invalidate()
+    return {"message": f"{count} brand vectors created or updated", "updated": count, "skipped": skipped}
 
         
\ No newline at end of file
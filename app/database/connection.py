@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from pgvector.asyncpg import register_vector
 from dotenv import load_dotenv
 import os
 from sqlalchemy.orm import declarative_base
@@ -9,7 +12,31 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL env var is required")
-engine = create_engine(DATABASE_URL, echo=os.getenv("SQL_ECHO") == "1")
+
+# 커넥션 풀 설정 (워커 프로세스마다 별도 풀)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# 풀이 가득 찼을 때 커넥션을 기다리는 최대 시간(초)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# 서버/LB의 유휴 연결 종료보다 먼저 재연결하도록 주기적으로 교체(초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+_pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "echo": os.getenv("SQL_ECHO") == "1",
+}
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"connect_timeout": DB_CONNECT_TIMEOUT},
+    **_pool_options
+)
 
 Base = declarative_base()
 
@@ -19,9 +46,35 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# 비동기 API용 엔진 (asyncpg), 지정하지 않으면 DATABASE_URL의 드라이버만 바꿔서 사용
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"timeout": DB_CONNECT_TIMEOUT},
+    **_pool_options
+)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    # asyncpg는 vector 타입을 모르므로 커넥션마다 pgvector 코덱 등록
+    dbapi_connection.run_async(register_vector)
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
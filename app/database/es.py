@@ -1,4 +1,4 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 from dotenv import load_dotenv
 import os
 import logging
@@ -10,21 +10,30 @@ load_dotenv()
 ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL")
 ES_ID = os.getenv("ES_ID")
 ES_PW = os.getenv("ES_PW")
+# 로그 인덱스(store-click-log, brand-click-log, search-log)의 이벤트 시각 필드
+ES_LOG_TIMESTAMP_FIELD = os.getenv("ES_LOG_TIMESTAMP_FIELD", "createdAt")
 
 if not all([ELASTICSEARCH_URL, ES_ID, ES_PW]):
         raise ValueError("필수 Elasticsearch 환경 변수가 설정되지 않았습니다.")
 
-es = Elasticsearch(
-            ELASTICSEARCH_URL, 
-            basic_auth=(ES_ID, ES_PW),
-            verify_certs=True
-    )   
-
-#연결 확인
-try:
-        if not es.ping():
-                raise ConnectionError("Elasticsearch 서버에 연결할 수 없습니다.")
-        logger.info("Elasticsearch 연결 성공")
-except Exception as e:
-        logger.error(f"Elasticsearch 연결 실패: {e}")
-        raise
\ No newline at end of file
+# 노드당 커넥션 수, 요청 타임아웃(초), 재시도 설정
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "20"))
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "5"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "2"))
+ES_RETRY_ON_TIMEOUT = os.getenv("ES_RETRY_ON_TIMEOUT", "1") == "1"
+
+_es_options = {
+    "basic_auth": (ES_ID, ES_PW),
+    "verify_certs": True,
+    "connections_per_node": ES_CONNECTIONS_PER_NODE,
+    "request_timeout": ES_REQUEST_TIMEOUT,
+    "max_retries": ES_MAX_RETRIES,
+    "retry_on_timeout": ES_RETRY_ON_TIMEOUT,
+}
+
+es = Elasticsearch(ELASTICSEARCH_URL, **_es_options)
+
+# 비동기 API용 클라이언트 (aiohttp 필요)
+aes = AsyncElasticsearch(ELASTICSEARCH_URL, **_es_options)
+
+# 연결 확인은 import 시점이 아니라 서버 기동 시 app.database.pools.warm_up 에서 수행
@@ -0,0 +1,116 @@
+from sqlalchemy import text
+from app.database.connection import engine, async_engine, DB_POOL_SIZE
+from app.database.redis_client import r, ar, r_bin, ar_bin
+from app.database.es import es, aes
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 서버 기동 시 미리 열어둘 커넥션 수 (풀 크기를 넘지 않음)
+POOL_WARMUP = os.getenv("POOL_WARMUP", "1") == "1"
+DB_POOL_WARMUP_SIZE = min(int(os.getenv("DB_POOL_WARMUP_SIZE", "4")), DB_POOL_SIZE)
+REDIS_POOL_WARMUP_SIZE = int(os.getenv("REDIS_POOL_WARMUP_SIZE", "4"))
+
+
+def warm_up():
+    # 동기 클라이언트(학습/배치/벡터 API용) 커넥션을 미리 열어서 첫 요청의 TCP/TLS 핸드셰이크 제거
+    if not POOL_WARMUP:
+        return
+    # 여러 개를 동시에 체크아웃해야 풀에 서로 다른 커넥션이 쌓임
+    connections = []
+    try:
+        for _ in range(DB_POOL_WARMUP_SIZE):
+            connections.append(engine.connect())
+            connections[-1].execute(text("SELECT 1"))
+    except Exception as e:
+        logger.error(f"DB 커넥션 예열 실패: {e}")
+    finally:
+        for conn in connections:
+            conn.close()
+
+    for pool in (r.connection_pool, r_bin.connection_pool):
+        connections = []
+        try:
+            for _ in range(REDIS_POOL_WARMUP_SIZE):
+                connections.append(pool.get_connection())
+        except Exception as e:
+            logger.error(f"Redis 커넥션 예열 실패: {e}")
+        finally:
+            for conn in connections:
+                pool.release(conn)
+
+    try:
+        if not es.ping():
+            raise ConnectionError("Elasticsearch 서버에 연결할 수 없습니다.")
+        logger.info("Elasticsearch 연결 성공")
+    except Exception as e:
+        logger.error(f"Elasticsearch 연결 실패: {e}")
+
+
+async def _async_db_ping():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def async_warm_up():
+    # 비동기 API용 클라이언트 커넥션 예열
+    if not POOL_WARMUP:
+        return
+    results = await asyncio.gather(
+        *(_async_db_ping() for _ in range(DB_POOL_WARMUP_SIZE)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"비동기 DB 커넥션 예열 실패: {result}")
+            break
+
+    for pool in (ar.connection_pool, ar_bin.connection_pool):
+        connections = []
+        try:
+            for _ in range(REDIS_POOL_WARMUP_SIZE):
+                connections.append(await pool.get_connection())
+        except Exception as e:
+            logger.error(f"비동기 Redis 커넥션 예열 실패: {e}")
+        finally:
+            for conn in connections:
+                await pool.release(conn)
+
+    try:
+        if not await aes.ping():
+            raise ConnectionError("Elasticsearch 서버에 연결할 수 없습니다.")
+    except Exception as e:
+        logger.error(f"비동기 Elasticsearch 연결 실패: {e}")
+
+
+def _sqlalchemy_pool_stats(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+def _redis_pool_stats(pool) -> dict:
+    return {
+        "max_connections": pool.max_connections,
+        "available": len(getattr(pool, "_available_connections", [])),
+        "in_use": len(getattr(pool, "_in_use_connections", [])),
+    }
+
+
+def pool_stats() -> dict:
+    # 워커 프로세스 단위 풀 사용량 (checked_out/in_use가 최대치에 붙어 있으면 풀 크기 조정 필요)
+    return {
+        "db": _sqlalchemy_pool_stats(engine.pool),
+        "async_db": _sqlalchemy_pool_stats(async_engine.pool),
+        "redis": _redis_pool_stats(r.connection_pool),
+        "async_redis": _redis_pool_stats(ar.connection_pool),
+        "redis_bin": _redis_pool_stats(r_bin.connection_pool),
+        "async_redis_bin": _redis_pool_stats(ar_bin.connection_pool),
+        "elasticsearch": {"nodes": len(es.transport.node_pool.all())},
+        "async_elasticsearch": {"nodes": len(aes.transport.node_pool.all())},
+    }
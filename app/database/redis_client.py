@@ -1,4 +1,8 @@
 import redis
+import redis.asyncio
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+from redis.asyncio.retry import Retry as AsyncRetry
 import ssl
 import os
 from dotenv import load_dotenv
@@ -11,10 +15,39 @@ ssl_cert_map = {
     "optional": ssl.CERT_OPTIONAL
 }
 
-r = redis.Redis(
-    host=os.getenv("REDIS_HOST"),
-    port=int(os.getenv("REDIS_PORT")),
-    ssl=True,
-    ssl_cert_reqs=ssl_cert_map[os.getenv("REDIS_SSL_CERT_REQS", "required").lower()],
-    decode_responses=True
-)
+# 커넥션 풀/타임아웃/재시도 설정
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2.0"))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", "2"))
+# 재시도 간격: base * 2^n 초, 최대 cap 초
+REDIS_BACKOFF_BASE = float(os.getenv("REDIS_BACKOFF_BASE", "0.01"))
+REDIS_BACKOFF_CAP = float(os.getenv("REDIS_BACKOFF_CAP", "0.5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+
+def _redis_options(retry_class, decode_responses: bool = True) -> dict:
+    return {
+        "host": os.getenv("REDIS_HOST"),
+        "port": int(os.getenv("REDIS_PORT")),
+        "ssl": True,
+        "ssl_cert_reqs": ssl_cert_map[os.getenv("REDIS_SSL_CERT_REQS", "required").lower()],
+        "decode_responses": decode_responses,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry": retry_class(ExponentialBackoff(cap=REDIS_BACKOFF_CAP, base=REDIS_BACKOFF_BASE), REDIS_RETRIES),
+        "retry_on_error": [redis.exceptions.ConnectionError, redis.exceptions.TimeoutError],
+    }
+
+
+r = redis.Redis(**_redis_options(Retry))
+
+# 비동기 API용 클라이언트 (설정은 r과 동일)
+ar = redis.asyncio.Redis(**_redis_options(AsyncRetry))
+
+# 추천/벡터 캐시용 바이너리 클라이언트 (msgpack, float32 바이트를 문자열 디코딩 없이 그대로 읽고 씀)
+r_bin = redis.Redis(**_redis_options(Retry, decode_responses=False))
+ar_bin = redis.asyncio.Redis(**_redis_options(AsyncRetry, decode_responses=False))
@@ -1,11 +1,41 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.api import vector, recommend
+from app.services import embedding_service
+from app.database.connection import async_engine
+from app.database.redis_client import ar, ar_bin
+from app.database.es import aes
+from app.database.pools import warm_up, async_warm_up, pool_stats
+import os
 
 app = FastAPI()
 
+@app.on_event("startup")
+def preload_embedding_model():
+    # 첫 요청이 모델 로드 시간을 떠안지 않도록 기동 단계에서 미리 로드
+    if os.getenv("EMBEDDING_PRELOAD", "1") == "1":
+        embedding_service.get_model()
+
+@app.on_event("startup")
+async def warm_up_connections():
+    # 첫 요청들이 커넥션 생성(TCP/TLS 핸드셰이크) 비용을 떠안지 않도록 미리 연결
+    await async_warm_up()
+    await run_in_threadpool(warm_up)
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    await aes.close()
+    await ar.aclose()
+    await ar_bin.aclose()
+    await async_engine.dispose()
+
 app.include_router(vector.router, prefix="/api")
 app.include_router(recommend.router, prefix="/api")
 
 @app.get("/health", tags=["Health"])
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/health/pools", tags=["Health"])
+def pool_health():
+    return pool_stats()
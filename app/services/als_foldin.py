@@ -0,0 +1,58 @@
+import numpy as np
+from collections import OrderedDict
+from app.services.als_store import ALSModelState
+import threading
+import time
+import os
+
+# fold-in으로 계산한 사용자 팩터 캐시 유지 시간(초)
+ALS_FOLDIN_TTL = float(os.getenv("ALS_FOLDIN_TTL", "30"))
+ALS_FOLDIN_CACHE_SIZE = int(os.getenv("ALS_FOLDIN_CACHE_SIZE", "10000"))
+# 1이면 학습에 포함된 사용자도 학습 이후 상호작용을 더해서 팩터를 갱신
+ALS_FOLDIN_EXISTING = os.getenv("ALS_FOLDIN_EXISTING", "0") == "1"
+
+
+def fold_in_user(state: ALSModelState, item_indices: np.ndarray, confidences: np.ndarray) -> np.ndarray:
+    # 아이템 팩터 Y를 고정하고 implicit ALS의 사용자 업데이트 식을 닫힌 형태로 풂
+    #   (Y^T Y + Y_u^T (C_u - I) Y_u + λI) x_u = Y_u^T C_u p_u
+    item_factors = np.asarray(state.item_factors[item_indices], dtype=np.float64)
+    confidences = np.asarray(confidences, dtype=np.float64)
+
+    a = state.yty + (item_factors.T * (confidences - 1.0)) @ item_factors
+    a += state.regularization * np.eye(item_factors.shape[1])
+    b = item_factors.T @ confidences
+    return np.linalg.solve(a, b).astype(np.float32)
+
+
+class FoldInCache:
+    # (모델 버전, user_id) -> 사용자 팩터, TTL이 지나거나 모델이 바뀌면 다시 계산
+    def __init__(self, ttl: float = ALS_FOLDIN_TTL, max_size: int = ALS_FOLDIN_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, user_id: int) -> tuple[bool, np.ndarray | None]:
+        key = (version, user_id)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return False, None
+            expires_at, factor = entry
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return False, None
+            self._items.move_to_end(key)
+            return True, factor
+
+    def set(self, version, user_id: int, factor: np.ndarray | None):
+        with self._lock:
+            self._items[(version, user_id)] = (time.monotonic() + self.ttl, factor)
+            self._items.move_to_end((version, user_id))
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            for key in [key for key in self._items if key[1] == user_id]:
+                del self._items[key]
@@ -0,0 +1,220 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from datetime import datetime
+import fcntl
+import shutil
+import json
+import sys
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 컨테이너를 다시 만들어도 모델이 남도록 볼륨으로 마운트하는 절대 경로
+ALS_MODEL_DIR = os.getenv("ALS_MODEL_DIR", "/var/lib/uble-reco/als")
+ALS_KEEP_VERSIONS = int(os.getenv("ALS_KEEP_VERSIONS", "5"))
+ALS_FACTORS = int(os.getenv("ALS_FACTORS", "50"))
+ALS_REGULARIZATION = float(os.getenv("ALS_REGULARIZATION", "0.01"))
+ALS_ITERATIONS = int(os.getenv("ALS_ITERATIONS", "20"))
+
+_ARRAY_FILES = (
+    "user_factors",
+    "item_factors",
+    "user_items_data",
+    "user_items_indices",
+    "user_items_indptr",
+    "user_ids",
+    "item_ids",
+)
+
+
+class ALSModelState:
+    # 한 번의 학습 결과(팩터 + id 배열)를 묶은 불변 스냅샷
+    # user_ids/item_ids는 정렬된 원래 id 배열이고, 배열 위치가 곧 행렬의 행/열 코드
+    def __init__(
+        self,
+        user_factors,
+        item_factors,
+        user_items,
+        user_ids,
+        item_ids,
+        trained_at,
+        regularization: float = ALS_REGULARIZATION,
+        version=None
+    ):
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.user_items = user_items
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.trained_at = trained_at
+        self.regularization = regularization
+        self.version = version
+        self._yty = None
+
+    @property
+    def yty(self) -> np.ndarray:
+        # fold-in 계산에 쓰는 Y^T Y, 스냅샷마다 한 번만 계산
+        if self._yty is None:
+            item_factors = np.asarray(self.item_factors, dtype=np.float64)
+            self._yty = item_factors.T @ item_factors
+        return self._yty
+
+    @staticmethod
+    def _find(sorted_ids: np.ndarray, value: int) -> int | None:
+        pos = int(np.searchsorted(sorted_ids, value))
+        if pos < len(sorted_ids) and sorted_ids[pos] == value:
+            return pos
+        return None
+
+    @staticmethod
+    def _find_many(sorted_ids: np.ndarray, values) -> np.ndarray:
+        values = np.asarray(values, dtype=np.int64)
+        if len(sorted_ids) == 0:
+            return np.full(len(values), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == values, pos, -1)
+
+    def user_code(self, user_id: int) -> int | None:
+        return self._find(self.user_ids, user_id)
+
+    def user_codes(self, user_ids) -> np.ndarray:
+        # 여러 사용자를 한 번에 조회, 학습에 없던 사용자는 -1
+        return self._find_many(self.user_ids, user_ids)
+
+    def item_index(self, item_id: int) -> int | None:
+        return self._find(self.item_ids, item_id)
+
+    def item_indices(self, item_ids) -> np.ndarray:
+        # 여러 id를 한 번에 조회, 학습에 없던 id는 -1
+        return self._find_many(self.item_ids, item_ids)
+
+
+class ALSArtifactStore:
+    # 학습 결과를 버전별 디렉터리에 .npy 파일로 저장하고 CURRENT 파일로 활성 버전을 지정
+    # 워커들은 mmap으로 열어서 같은 페이지 캐시를 공유
+    def __init__(self, root: str = ALS_MODEL_DIR, keep_versions: int = ALS_KEEP_VERSIONS):
+        self.root = root
+        self.keep_versions = keep_versions
+
+    def _path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def list_versions(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(self._path(name, "meta.json"))
+        )
+
+    def current_version(self) -> str | None:
+        try:
+            with open(self._path("CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version: str):
+        if version not in self.list_versions():
+            raise ValueError(f"존재하지 않는 ALS 모델 버전: {version}")
+        tmp_path = self._path("CURRENT.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, self._path("CURRENT"))
+
+    def save(self, state: ALSModelState) -> str:
+        version = state.trained_at.strftime("%Y%m%dT%H%M%S%f")
+        tmp_dir = self._path(f".{version}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        arrays = {
+            "user_factors": state.user_factors,
+            "item_factors": state.item_factors,
+            "user_items_data": state.user_items.data,
+            "user_items_indices": state.user_items.indices,
+            "user_items_indptr": state.user_items.indptr,
+            "user_ids": state.user_ids,
+            "item_ids": state.item_ids,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({
+                "trained_at": state.trained_at.isoformat(),
+                "user_items_shape": list(state.user_items.shape),
+                "regularization": state.regularization,
+            }, f)
+
+        # 디렉터리 rename 후 CURRENT 교체 -> 읽는 쪽은 완성된 버전만 보게 됨
+        os.replace(tmp_dir, self._path(version))
+        self.activate(version)
+        self.prune()
+        state.version = version
+        return version
+
+    def load(self, version: str | None = None, mmap: bool = True) -> ALSModelState | None:
+        version = version or self.current_version()
+        if version is None:
+            return None
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(self._path(version, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in _ARRAY_FILES
+        }
+        with open(self._path(version, "meta.json")) as f:
+            meta = json.load(f)
+
+        user_items = csr_matrix(
+            (arrays["user_items_data"], arrays["user_items_indices"], arrays["user_items_indptr"]),
+            shape=tuple(meta["user_items_shape"]),
+            copy=False
+        )
+        return ALSModelState(
+            user_factors=arrays["user_factors"],
+            item_factors=arrays["item_factors"],
+            user_items=user_items,
+            user_ids=arrays["user_ids"],
+            item_ids=arrays["item_ids"],
+            trained_at=datetime.fromisoformat(meta["trained_at"]),
+            regularization=meta.get("regularization", ALS_REGULARIZATION),
+            version=version
+        )
+
+    def prune(self):
+        # 활성 버전은 남기고 오래된 버전부터 삭제 (롤백용으로 keep_versions개 유지)
+        current = self.current_version()
+        versions = self.list_versions()
+        for version in versions[:max(0, len(versions) - self.keep_versions)]:
+            if version != current:
+                shutil.rmtree(self._path(version), ignore_errors=True)
+
+    def try_lock_training(self):
+        # 여러 워커 중 한 곳에서만 학습하도록 파일 잠금, 잠금 실패 시 None
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(self._path("train.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+
+als_store = ALSArtifactStore()
+
+
+if __name__ == "__main__":
+    # python -m app.services.als_store list
+    # python -m app.services.als_store rollback <version>
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        current = als_store.current_version()
+        for version in als_store.list_versions():
+            print(f"{'*' if version == current else ' '} {version}")
+    elif command == "rollback" and len(sys.argv) > 2:
+        als_store.activate(sys.argv[2])
+        print(f"활성 버전 변경: {sys.argv[2]}")
+    else:
+        print("usage: python -m app.services.als_store [list | rollback <version>]")
+        sys.exit(1)
@@ -0,0 +1,246 @@
+import numpy as np
+import argparse
+import csv
+import json
+import time
+import os
+import sys
+import logging
+from sqlalchemy.orm import Session
+from elasticsearch import Elasticsearch
+from app.services.als_store import ALSModelState, als_store
+from app.services.brand_index import brand_index
+from app.services.collect_user_data import UserDataCollectionError, collect_users_data
+from app.services.embedding_service import encode_texts
+from app.services.score_fusion import fuse_scores
+from app.services.store_catalog import store_catalog, fetch_recommendation_items
+from app.services.recommend_cache import set_brand_lists
+from app.services.user_vector_cache import get_user_vectors, set_user_vectors
+from app.database.connection import SessionLocal
+from app.database.es import es
+
+logger = logging.getLogger(__name__)
+
+# 한 번에 행렬 곱을 계산할 사용자 수
+BATCH_RECOMMEND_BLOCK_SIZE = int(os.getenv("BATCH_RECOMMEND_BLOCK_SIZE", "1024"))
+BATCH_RECOMMEND_TOP_K = int(os.getenv("BATCH_RECOMMEND_TOP_K", "10"))
+# 사전 계산한 브랜드 순위 유지 시간(초), 배치 실행 주기보다 길게 설정
+BATCH_RECOMMEND_TTL = int(os.getenv("BATCH_RECOMMEND_TTL", "86400"))
+# /recommend/hybrid/batch 요청 한 번에 받을 최대 사용자 수
+BATCH_RECOMMEND_MAX_USERS = int(os.getenv("BATCH_RECOMMEND_MAX_USERS", "10000"))
+
+
+def _profile_text(data: tuple) -> str | None:
+    categories, histories, bookmarks, clicks, searches = data
+    if not (categories or histories or bookmarks or clicks or searches):
+        return None
+    return "; ".join(categories + histories + bookmarks + clicks + searches)
+
+
+def load_user_vectors(profiles: dict) -> dict:
+    # profiles: user_id -> 프로필 텍스트
+    # 프로필 해시가 같은 캐시 벡터만 재사용하고 나머지는 배치 인코딩
+    user_ids = list(profiles)
+    vectors = get_user_vectors(user_ids, profiles) if user_ids else {}
+    missing = [user_id for user_id in user_ids if user_id not in vectors]
+    if missing:
+        encoded = encode_texts([profiles[user_id] for user_id in missing])
+        entries = [(user_id, profiles[user_id], user_vec) for user_id, user_vec in zip(missing, encoded)]
+        vectors.update({user_id: user_vec for user_id, _, user_vec in entries})
+        try:
+            set_user_vectors(entries)
+        except Exception as e:
+            logger.error(f"사용자 벡터 캐시 저장 실패: {e}")
+    return vectors
+
+
+def collect_profiles(db: Session, es: Elasticsearch, user_ids: list) -> dict:
+    # 사용자 정보를 테이블/인덱스 단위 일괄 조회로 수집해서 프로필 텍스트로 합침 (정보가 없는 사용자는 제외)
+    profiles = {user_id: _profile_text(data) for user_id, data in collect_users_data(user_ids, db, es).items()}
+    return {user_id: profile_text for user_id, profile_text in profiles.items() if profile_text is not None}
+
+
+def score_block(
+    state: ALSModelState | None,
+    user_codes: np.ndarray,
+    user_vectors: np.ndarray,
+    top_k: int = BATCH_RECOMMEND_TOP_K
+) -> list:
+    # ALS 점수와 브랜드 임베딩 코사인 유사도를 블록 단위 행렬 곱으로 계산
+    # 온라인 경로와 같은 fuse_scores로 후보 합집합을 정규화해서 합침
+    # ALS 모델에 없는 사용자(code -1)는 임베딩 점수만으로 순위를 매김
+    brand_ids, brand_matrix = brand_index.snapshot()
+
+    norms = np.linalg.norm(user_vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vec_scores = (user_vectors / norms) @ brand_matrix.T
+
+    user_codes = np.asarray(user_codes, dtype=np.int64)
+    if state is None:
+        user_codes = np.full(len(user_codes), -1, dtype=np.int64)
+    known = np.flatnonzero(user_codes >= 0)
+    unknown = np.flatnonzero(user_codes < 0)
+
+    results = [[] for _ in range(len(user_codes))]
+    if len(known):
+        als_scores = np.asarray(state.user_factors[user_codes[known]]) @ np.asarray(state.item_factors).T
+        fused = fuse_scores(als_scores, state.item_ids, vec_scores[known], brand_ids, top_k)
+        for row, scores in zip(known, fused):
+            results[row] = scores
+    if len(unknown):
+        fused = fuse_scores(None, np.empty(0, dtype=np.int64), vec_scores[unknown], brand_ids, top_k)
+        for row, scores in zip(unknown, fused):
+            results[row] = scores
+    return results
+
+
+def write_brand_lists(user_ids: list, results: list, ttl: int = BATCH_RECOMMEND_TTL):
+    # 온라인 경로의 1단계 캐시(brand_list_key)와 같은 형식으로 파이프라인 저장
+    set_brand_lists(list(zip(user_ids, results)), ttl)
+
+
+def precompute_recommendations(
+    db: Session,
+    es: Elasticsearch,
+    state: ALSModelState | None = None,
+    block_size: int = BATCH_RECOMMEND_BLOCK_SIZE,
+    top_k: int = BATCH_RECOMMEND_TOP_K
+) -> dict:
+    # 활성 사용자(현재 ALS 모델에 포함된 사용자) 전체의 추천 브랜드 순위를 미리 계산해서 Redis에 저장
+    state = state or als_store.load()
+    if state is None:
+        raise RuntimeError("저장된 ALS 모델이 없습니다.")
+    brand_index.ensure_fresh(db)
+    if len(brand_index.brand_ids) == 0:
+        raise RuntimeError("브랜드 임베딩이 없습니다.")
+
+    started = time.monotonic()
+    written = skipped = failed = 0
+    all_user_ids = state.user_ids
+
+    for start in range(0, len(all_user_ids), block_size):
+        block_user_ids = [int(user_id) for user_id in all_user_ids[start:start + block_size]]
+        try:
+            vectors = load_user_vectors(collect_profiles(db, es, block_user_ids))
+        except UserDataCollectionError as e:
+            # 일부 소스가 빠진 프로필로 순위를 덮어쓰지 않고 기존 캐시를 유지
+            logger.error(f"추천 사전 계산 블록 실패 ({start}~{start + len(block_user_ids)}): {e}")
+            failed += len(block_user_ids)
+            continue
+
+        # 프로필 정보가 없는 사용자는 온라인 경로와 마찬가지로 추천하지 않음
+        user_ids = [user_id for user_id in block_user_ids if user_id in vectors]
+        skipped += len(block_user_ids) - len(user_ids)
+        if not user_ids:
+            continue
+
+        user_codes = np.arange(start, start + len(block_user_ids))[
+            np.isin(block_user_ids, user_ids)
+        ]
+        user_vectors = np.stack([vectors[user_id] for user_id in user_ids]).astype(np.float32)
+        results = score_block(state, user_codes, user_vectors, top_k)
+        write_brand_lists(user_ids, results)
+        written += len(user_ids)
+        logger.info(f"추천 사전 계산 진행: {start + len(block_user_ids)}/{len(all_user_ids)}")
+
+    elapsed = time.monotonic() - started
+    logger.info(f"추천 사전 계산 완료: 저장 {written}명, 건너뜀 {skipped}명, 실패 {failed}명, {elapsed:.1f}초")
+    return {
+        "version": state.version,
+        "written": written,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": round(elapsed, 1)
+    }
+
+
+def _recommend_block(db: Session, es: Elasticsearch, state: ALSModelState | None, requests: list, radius_m: float, top_k: int) -> list:
+    user_ids = list(dict.fromkeys(user_id for user_id, _, _ in requests))
+
+    # 1. 사용자 정보를 테이블/인덱스 단위 일괄 조회로 수집
+    # 조회 실패 시 블록 전체를 실패로 반환하고 불완전한 프로필로 벡터를 만들거나 캐시하지 않음
+    try:
+        profiles = collect_profiles(db, es, user_ids)
+    except UserDataCollectionError as e:
+        logger.error(f"일괄 추천 블록 실패 (users: {len(user_ids)}): {e}")
+        return [{"userId": user_id, "error": "사용자 정보 조회에 실패했습니다."} for user_id, _, _ in requests]
+    profile_user_ids = list(profiles)
+
+    # 2. 프로필이 같은 캐시 벡터는 재사용하고 나머지만 배치 인코딩
+    vectors = load_user_vectors(profiles)
+
+    # 3. 블록 단위 행렬 연산으로 브랜드 순위 계산
+    brand_lists = {}
+    if profile_user_ids:
+        user_codes = state.user_codes(profile_user_ids) if state is not None else np.full(len(profile_user_ids), -1)
+        user_vectors = np.stack([vectors[user_id] for user_id in profile_user_ids]).astype(np.float32)
+        results = score_block(state, user_codes, user_vectors, top_k)
+        brand_lists = {
+            user_id: [[int(brand_id), float(score)] for brand_id, score in scores]
+            for user_id, scores in zip(profile_user_ids, results)
+        }
+
+    # 4. 요청 위치마다 추천 브랜드별 반경 내 가장 가까운 매장
+    lines = []
+    for user_id, lat, lng in requests:
+        results = brand_lists.get(user_id)
+        if results is None:
+            lines.append({"userId": user_id, "error": "사용자 정보가 부족합니다."})
+            continue
+        items = store_catalog.recommendation_items(results, lat, lng, radius_m)
+        if items is None:
+            items = fetch_recommendation_items(db, results, lat, lng, radius_m)
+        lines.append({"userId": user_id, "recommendationsList": items})
+    return lines
+
+
+def recommend_users(
+    requests: list,
+    radius_km: float = 2.0,
+    state: ALSModelState | None = None,
+    block_size: int = BATCH_RECOMMEND_BLOCK_SIZE,
+    top_k: int = BATCH_RECOMMEND_TOP_K
+):
+    # (user_id, lat, lng) 목록에 대한 /recommend/hybrid 결과를 블록 단위로 계산해서 한 건씩 반환
+    # ALS는 학습된 사용자 요인만 사용 (요청 단위 fold-in은 하지 않음)
+    requests = [(int(user_id), float(lat), float(lng)) for user_id, lat, lng in requests]
+    with SessionLocal() as db:
+        brand_index.ensure_fresh(db)
+        for start in range(0, len(requests), block_size):
+            block = requests[start:start + block_size]
+            yield from _recommend_block(db, es, state, block, radius_km * 1000, top_k)
+            logger.info(f"일괄 추천 진행: {start + len(block)}/{len(requests)}")
+
+
+def _read_requests(path: str) -> list:
+    # CSV (user_id,lat,lng), 헤더 행은 있어도 되고 없어도 됨
+    with open(path, newline="") as f:
+        rows = [row for row in csv.reader(f) if row]
+    if rows and not rows[0][0].strip().lstrip("-").isdigit():
+        rows = rows[1:]
+    return [(int(user_id), float(lat), float(lng)) for user_id, lat, lng in rows]
+
+
+if __name__ == "__main__":
+    # python -m app.services.batch_recommend                       : 활성 사용자 브랜드 순위 사전 계산
+    # python -m app.services.batch_recommend recommend --input users.csv > out.ndjson
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", nargs="?", choices=("precompute", "recommend"), default="precompute")
+    parser.add_argument("--input", help="user_id,lat,lng CSV (recommend)")
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "recommend":
+        if not args.input:
+            parser.error("recommend에는 --input이 필요합니다.")
+        for line in recommend_users(_read_requests(args.input), args.radius_km, state=als_store.load()):
+            sys.stdout.write(json.dumps(line, ensure_ascii=False) + "\n")
+        sys.exit(0)
+
+    with SessionLocal() as db:
+        try:
+            print(precompute_recommendations(db, es))
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
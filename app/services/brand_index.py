@@ -0,0 +1,127 @@
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import BrandEmbedding
+import asyncio
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# updated_at 변경 여부를 확인하는 최소 간격(초)
+BRAND_INDEX_CHECK_INTERVAL = float(os.getenv("BRAND_INDEX_CHECK_INTERVAL", "60"))
+
+VERSION_QUERY = select(func.max(BrandEmbedding.updated_at), func.count(BrandEmbedding.id))
+ROWS_QUERY = (
+    select(BrandEmbedding.brand_id, BrandEmbedding.embedding)
+    .where(BrandEmbedding.embedding.isnot(None))
+    .order_by(BrandEmbedding.brand_id)
+)
+
+
+class BrandEmbeddingIndex:
+    # brand_embedding 테이블을 정규화된 float32 행렬로 메모리에 유지
+    def __init__(self, check_interval: float = BRAND_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        # (brand_ids, matrix) 튜플을 통째로 교체해서 읽는 쪽이 항상 일관된 쌍을 보도록 함
+        self._data = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        # 비동기 경로에서 동시에 여러 요청이 다시 적재하지 않도록 하는 잠금
+        self._async_lock = asyncio.Lock()
+
+    @property
+    def brand_ids(self) -> np.ndarray:
+        return self._data[0]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._data[1]
+
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        # 배치 계산처럼 여러 번 참조할 때 같은 버전의 (brand_ids, matrix) 쌍을 받기 위해 사용
+        return self._data
+
+    def invalidate(self):
+        self._stale = True
+
+    def _is_fresh(self) -> bool:
+        return not self._stale and time.monotonic() - self._checked_at < self.check_interval
+
+    def ensure_fresh(self, db: Session):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            # 전체 행 대신 (최신 updated_at, 행 수)만 조회해서 변경 여부 판단
+            version = tuple(db.execute(VERSION_QUERY).one())
+            if self._stale or version != self._version:
+                self._load(db.execute(ROWS_QUERY).all())
+                self._version = version
+            self._checked_at = time.monotonic()
+            self._stale = False
+
+    async def aensure_fresh(self, db: AsyncSession):
+        # ensure_fresh의 비동기 버전: 조회는 AsyncSession으로 하고 행렬 교체만 동기 잠금 안에서 수행
+        if self._is_fresh():
+            return
+        async with self._async_lock:
+            if self._is_fresh():
+                return
+            version = tuple((await db.execute(VERSION_QUERY)).one())
+            rows = None
+            if self._stale or version != self._version:
+                rows = (await db.execute(ROWS_QUERY)).all()
+            with self._lock:
+                if rows is not None:
+                    self._load(rows)
+                    self._version = version
+                self._checked_at = time.monotonic()
+                self._stale = False
+
+    def _load(self, rows: list):
+        if not rows:
+            self._data = (np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+            return
+
+        brand_ids = np.fromiter((brand_id for brand_id, _ in rows), dtype=np.int64, count=len(rows))
+        matrix = np.stack([np.asarray(emb, dtype=np.float32) for _, emb in rows])
+
+        # 미리 L2 정규화해두면 코사인 유사도가 내적 한 번으로 끝남
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        self._data = (brand_ids, matrix)
+        logger.info(f"브랜드 임베딩 행렬 로드 완료: {matrix.shape}")
+
+    def scores(self, user_vec) -> tuple[np.ndarray, np.ndarray | None]:
+        # 전체 브랜드에 대한 코사인 유사도, 계산할 수 없으면 None
+        brand_ids, matrix = self._data
+        if len(brand_ids) == 0:
+            return brand_ids, None
+
+        query = np.asarray(user_vec, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return brand_ids, None
+        return brand_ids, matrix @ (query / norm)
+
+    def top_k(self, user_vec, top_k: int = 10) -> dict:
+        brand_ids, scores = self.scores(user_vec)
+        if scores is None or top_k <= 0:
+            return {}
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return {int(brand_ids[i]): float(scores[i]) for i in top}
+
+
+brand_index = BrandEmbeddingIndex()
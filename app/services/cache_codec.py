@@ -0,0 +1,59 @@
+import msgpack
+import zlib
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Redis 캐시 값: 헤더 1바이트(압축 방식) + msgpack
+# 임계값보다 큰 값만 압축 (작은 값은 압축 헤더/CPU 비용이 더 큼)
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib").lower()
+CACHE_COMPRESSION_THRESHOLD = int(os.getenv("CACHE_COMPRESSION_THRESHOLD", "1024"))
+CACHE_ZLIB_LEVEL = int(os.getenv("CACHE_ZLIB_LEVEL", "6"))
+
+HEADER_RAW = 0x00
+HEADER_ZLIB = 0x01
+HEADER_LZ4 = 0x02
+
+if CACHE_COMPRESSION == "lz4" and lz4_frame is None:
+    logger.warning("lz4 패키지가 없어 zlib 압축을 사용합니다.")
+    CACHE_COMPRESSION = "zlib"
+elif CACHE_COMPRESSION not in ("zlib", "lz4", "none"):
+    logger.warning(f"알 수 없는 CACHE_COMPRESSION '{CACHE_COMPRESSION}', zlib 압축을 사용합니다.")
+    CACHE_COMPRESSION = "zlib"
+
+
+def _compress(payload: bytes) -> bytes:
+    if CACHE_COMPRESSION == "none" or len(payload) < CACHE_COMPRESSION_THRESHOLD:
+        return bytes([HEADER_RAW]) + payload
+    if CACHE_COMPRESSION == "lz4":
+        return bytes([HEADER_LZ4]) + lz4_frame.compress(payload)
+    return bytes([HEADER_ZLIB]) + zlib.compress(payload, CACHE_ZLIB_LEVEL)
+
+
+def _decompress(data: bytes) -> bytes:
+    header, payload = data[0], data[1:]
+    if header == HEADER_RAW:
+        return payload
+    if header == HEADER_ZLIB:
+        return zlib.decompress(payload)
+    if header == HEADER_LZ4:
+        if lz4_frame is None:
+            raise ValueError("lz4로 압축된 캐시 값이지만 lz4 패키지가 없습니다.")
+        return lz4_frame.decompress(payload)
+    # 헤더가 없는 예전 JSON 값 등
+    raise ValueError(f"알 수 없는 캐시 헤더: {header:#04x}")
+
+
+def pack(value, single_float: bool = False) -> bytes:
+    # single_float: 실수를 float32로 저장 (추천 점수처럼 순위에만 쓰는 값, 좌표에는 쓰지 않음)
+    return _compress(msgpack.packb(value, use_single_float=single_float))
+
+
+def unpack(data: bytes):
+    return msgpack.unpackb(_decompress(data))
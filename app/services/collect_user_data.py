@@ -1,61 +1,392 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import scan
+from sqlalchemy.engine import Engine
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from elasticsearch.helpers import scan, async_scan
+from app.database.es import ES_LOG_TIMESTAMP_FIELD
+from app.database.connection import async_engine
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import asyncio
+import time
+import os
 import logging
 
 logger = logging.getLogger(__name__)
 
-def collect_user_data(user_id: int, db: Session, es: Elasticsearch) -> tuple[list, list, list, list, list]:
-    
-    #RDB에서 가져오는 데이터
-    categories = db.execute(text("""
-        SELECT c.name FROM user_category uc
-        JOIN category c ON uc.category_id = c.id
-        WHERE uc.user_id = :user_id
-    """), {"user_id": user_id}).scalars().all()
-
-    histories = db.execute(text("""
-        SELECT s.name FROM usage_history uh
-        JOIN store s ON uh.store_id = s.id
-        WHERE uh.user_id = :user_id
-    """), {"user_id": user_id}).scalars().all()
-
-    bookmarks = db.execute(text("""
-        SELECT b.description FROM bookmark bm
-        JOIN brand b ON bm.brand_id = b.id
-        WHERE bm.user_id = :user_id
-    """), {"user_id": user_id}).scalars().all()
-
-    # es에서 가져오는 클릭 로그
-    clicks = []
-    try:
-        for doc in scan(es, index="store-click-log", query={
-            "query": {
-                "term": {
-                    "userId": user_id
-                }
+
+class UserDataCollectionError(Exception):
+    # 일괄 조회에서 소스 하나라도 실패하면 발생 (일부만 채워진 프로필로 추천/캐시하지 않도록 함)
+    pass
+
+
+# 소스별 타임아웃(초). 초과하면 해당 소스만 빈 결과로 대체
+USER_DATA_SQL_TIMEOUT = float(os.getenv("USER_DATA_SQL_TIMEOUT", "1.0"))
+USER_DATA_ES_TIMEOUT = float(os.getenv("USER_DATA_ES_TIMEOUT", "1.5"))
+USER_DATA_WORKERS = int(os.getenv("USER_DATA_WORKERS", "20"))
+# 여러 사용자를 한 번에 조회할 때의 요청당 타임아웃(초): SQL 쿼리 하나, ES 집계/스크롤 페이지 하나 기준
+USER_DATA_BULK_TIMEOUT = float(os.getenv("USER_DATA_BULK_TIMEOUT", "30"))
+# ES terms 필터 하나에 담을 사용자 수 (index.max_terms_count 기본값 65536 이하)와 composite 집계 페이지 크기
+USER_DATA_TERMS_SIZE = int(os.getenv("USER_DATA_TERMS_SIZE", "10000"))
+USER_DATA_COMPOSITE_PAGE_SIZE = int(os.getenv("USER_DATA_COMPOSITE_PAGE_SIZE", "5000"))
+
+# scan: 사용자의 전체 클릭/검색 로그를 스크롤로 조회 (기본값)
+# aggregate: 최근 기간의 상위 N개 매장명/검색어를 빈도와 함께 한 번의 검색으로 조회
+#   로그 매핑에 ES_LOG_TIMESTAMP_FIELD 날짜 필드와 keyword 필드(USER_LOG_CLICK_FIELD, USER_LOG_SEARCH_FIELD)가
+#   있어야 하며, 없으면 오류 없이 빈 결과가 나오므로 매핑 확인 후에만 사용
+USER_LOG_FETCH_MODE = os.getenv("USER_LOG_FETCH_MODE", "scan").lower()
+USER_LOG_WINDOW_DAYS = int(os.getenv("USER_LOG_WINDOW_DAYS", "90"))
+USER_LOG_TOP_N = int(os.getenv("USER_LOG_TOP_N", "20"))
+# 프로필 텍스트에 같은 항목을 빈도만큼 반복할 최대 횟수
+USER_LOG_MAX_REPEAT = int(os.getenv("USER_LOG_MAX_REPEAT", "3"))
+USER_LOG_CLICK_FIELD = os.getenv("USER_LOG_CLICK_FIELD", "storeName.keyword")
+USER_LOG_SEARCH_FIELD = os.getenv("USER_LOG_SEARCH_FIELD", "searchKeyword.keyword")
+
+_executor = ThreadPoolExecutor(max_workers=USER_DATA_WORKERS, thread_name_prefix="user-data")
+
+CATEGORY_SQL = text("""
+    SELECT c.name FROM user_category uc
+    JOIN category c ON uc.category_id = c.id
+    WHERE uc.user_id = :user_id
+""")
+
+HISTORY_SQL = text("""
+    SELECT s.name FROM usage_history uh
+    JOIN store s ON uh.store_id = s.id
+    WHERE uh.user_id = :user_id
+""")
+
+BOOKMARK_SQL = text("""
+    SELECT b.description FROM bookmark bm
+    JOIN brand b ON bm.brand_id = b.id
+    WHERE bm.user_id = :user_id
+""")
+
+
+CATEGORY_BULK_SQL = text("""
+    SELECT uc.user_id, c.name FROM user_category uc
+    JOIN category c ON uc.category_id = c.id
+    WHERE uc.user_id = ANY(:user_ids)
+""")
+
+HISTORY_BULK_SQL = text("""
+    SELECT uh.user_id, s.name FROM usage_history uh
+    JOIN store s ON uh.store_id = s.id
+    WHERE uh.user_id = ANY(:user_ids)
+""")
+
+BOOKMARK_BULK_SQL = text("""
+    SELECT bm.user_id, b.description FROM bookmark bm
+    JOIN brand b ON bm.brand_id = b.id
+    WHERE bm.user_id = ANY(:user_ids)
+""")
+
+
+def _fetch_sql(engine: Engine, sql, user_id: int, timeout: float) -> list:
+    # Session은 스레드 간 공유할 수 없으므로 소스마다 풀에서 커넥션을 따로 사용
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        return conn.execute(sql, {"user_id": user_id}).scalars().all()
+
+
+def _user_query(user_id: int) -> dict:
+    return {
+        "query": {
+            "term": {
+                "userId": user_id
             }
-        }):
-            store_name = doc["_source"].get("storeName")
-            if store_name:
-                clicks.append(store_name)
-    except Exception as e:
-        logger.error(f"클릭 로그 조회 실패 (user_id: {user_id}: {e})")
-
-    # es에서 가져오는 검색 로그
+        }
+    }
+
+
+def _fetch_clicks(es: Elasticsearch, user_id: int, timeout: float) -> list:
+    clicks = []
+    for doc in scan(es.options(request_timeout=timeout), index="store-click-log", query=_user_query(user_id)):
+        store_name = doc["_source"].get("storeName")
+        if store_name:
+            clicks.append(store_name)
+    return clicks
+
+
+def _fetch_searches(es: Elasticsearch, user_id: int, timeout: float) -> list:
     searches = []
-    try:
-        for doc in scan(es, index="search-log", query={
-            "query": {
-                "term": {
-                    "userId": user_id
-                }
-            }       
-        }):
-            keyword = doc["_source"].get("searchKeyword")
-            if keyword:
-                searches.append(keyword)
-    except Exception as e:
-        logger.error(f"검색 로그 조회 실패 (user_id: {user_id}: {e})")
-    return categories, histories, bookmarks, clicks, searches
\ No newline at end of file
+    for doc in scan(es.options(request_timeout=timeout), index="search-log", query=_user_query(user_id)):
+        keyword = doc["_source"].get("searchKeyword")
+        if keyword:
+            searches.append(keyword)
+    return searches
+
+
+def _log_counts_request(user_id: int) -> dict:
+    # 클릭/검색 인덱스를 한 번에 검색하고 terms 집계로 (항목, 빈도) 상위 N개만 가져옴
+    return {
+        "index": "store-click-log,search-log",
+        "size": 0,
+        "query": {
+            "bool": {
+                "filter": [
+                    {"term": {"userId": user_id}},
+                    {"range": {ES_LOG_TIMESTAMP_FIELD: {"gte": f"now-{USER_LOG_WINDOW_DAYS}d/d"}}}
+                ]
+            }
+        },
+        "aggs": {
+            "clicks": {"terms": {"field": USER_LOG_CLICK_FIELD, "size": USER_LOG_TOP_N}},
+            "searches": {"terms": {"field": USER_LOG_SEARCH_FIELD, "size": USER_LOG_TOP_N}}
+        }
+    }
+
+
+def _parse_log_counts(response) -> tuple[list, list]:
+    aggregations = response.get("aggregations", {})
+    return tuple(
+        [(bucket["key"], bucket["doc_count"]) for bucket in aggregations.get(name, {}).get("buckets", [])]
+        for name in ("clicks", "searches")
+    )
+
+
+def fetch_user_log_counts(es: Elasticsearch, user_id: int, timeout: float) -> tuple[list, list]:
+    response = es.options(request_timeout=timeout).search(**_log_counts_request(user_id))
+    return _parse_log_counts(response)
+
+
+def expand_by_frequency(counts: list) -> list:
+    # 빈도를 프로필 텍스트 가중치로 반영하되 과도한 반복은 제한
+    return [term for term, count in counts for _ in range(min(count, USER_LOG_MAX_REPEAT))]
+
+
+def _fetch_logs(es: Elasticsearch, user_id: int, timeout: float) -> tuple[list, list]:
+    clicks, searches = fetch_user_log_counts(es, user_id, timeout)
+    return expand_by_frequency(clicks), expand_by_frequency(searches)
+
+
+def collect_user_data(user_id: int, db: Session, es: Elasticsearch) -> tuple[list, list, list, list, list]:
+    engine = db.get_bind()
+
+    # RDB 3개 + ES 소스를 동시에 조회
+    sources = {
+        "categories": (_fetch_sql, engine, CATEGORY_SQL, user_id, USER_DATA_SQL_TIMEOUT),
+        "histories": (_fetch_sql, engine, HISTORY_SQL, user_id, USER_DATA_SQL_TIMEOUT),
+        "bookmarks": (_fetch_sql, engine, BOOKMARK_SQL, user_id, USER_DATA_SQL_TIMEOUT),
+    }
+    if USER_LOG_FETCH_MODE == "scan":
+        sources["clicks"] = (_fetch_clicks, es, user_id, USER_DATA_ES_TIMEOUT)
+        sources["searches"] = (_fetch_searches, es, user_id, USER_DATA_ES_TIMEOUT)
+    else:
+        sources["logs"] = (_fetch_logs, es, user_id, USER_DATA_ES_TIMEOUT)
+
+    started = time.monotonic()
+    futures = {
+        name: (_executor.submit(fn, *args), args[-1])
+        for name, (fn, *args) in sources.items()
+    }
+
+    results = {}
+    for name, (future, timeout) in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error(f"사용자 데이터 조회 시간 초과 (source: {name}, user_id: {user_id})")
+            results[name] = ([], []) if name == "logs" else []
+        except Exception as e:
+            logger.error(f"사용자 데이터 조회 실패 (source: {name}, user_id: {user_id}): {e}")
+            results[name] = ([], []) if name == "logs" else []
+
+    if "logs" in results:
+        results["clicks"], results["searches"] = results.pop("logs")
+
+    return (
+        results["categories"],
+        results["histories"],
+        results["bookmarks"],
+        results["clicks"],
+        results["searches"]
+    )
+
+
+def _fetch_sql_bulk(engine: Engine, sql, user_ids: list, timeout: float) -> dict:
+    # 사용자 id 목록을 배열 파라미터 하나로 넘겨서 테이블당 쿼리 한 번으로 조회
+    grouped = {}
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        for user_id, value in conn.execute(sql, {"user_ids": list(user_ids)}):
+            grouped.setdefault(user_id, []).append(value)
+    return grouped
+
+
+def _users_filter(user_ids: list) -> dict:
+    return {"terms": {"userId": user_ids}}
+
+
+def _aggregate_logs_bulk(es: Elasticsearch, index_name: str, field: str, user_ids: list, timeout: float) -> dict:
+    # 인덱스당 userId terms 필터 + (userId, 항목) composite 집계로 사용자별 빈도를 페이지 단위 조회
+    # 단건 조회(_log_counts_request)와 같은 기간/상위 N개 기준으로 사용자별 결과를 맞춤
+    counts = {}
+    for start in range(0, len(user_ids), USER_DATA_TERMS_SIZE):
+        query = {
+            "bool": {
+                "filter": [
+                    _users_filter(user_ids[start:start + USER_DATA_TERMS_SIZE]),
+                    {"range": {ES_LOG_TIMESTAMP_FIELD: {"gte": f"now-{USER_LOG_WINDOW_DAYS}d/d"}}}
+                ]
+            }
+        }
+        composite = {
+            "size": USER_DATA_COMPOSITE_PAGE_SIZE,
+            "sources": [
+                {"user": {"terms": {"field": "userId"}}},
+                {"term": {"terms": {"field": field}}}
+            ]
+        }
+        while True:
+            response = es.options(request_timeout=timeout).search(
+                index=index_name, size=0, query=query, aggs={"pairs": {"composite": composite}}
+            )
+            pairs = response["aggregations"]["pairs"]
+            for bucket in pairs["buckets"]:
+                counts.setdefault(int(bucket["key"]["user"]), []).append((bucket["key"]["term"], bucket["doc_count"]))
+            after_key = pairs.get("after_key")
+            if not pairs["buckets"] or after_key is None:
+                break
+            composite["after"] = after_key
+
+    # terms 집계와 같은 순서(빈도 내림차순, 같으면 항목 오름차순)로 상위 N개
+    return {
+        user_id: expand_by_frequency(sorted(terms, key=lambda item: (-item[1], item[0]))[:USER_LOG_TOP_N])
+        for user_id, terms in counts.items()
+    }
+
+
+def _scan_logs_bulk(es: Elasticsearch, index_name: str, field: str, user_ids: list, timeout: float) -> dict:
+    # scan 모드: 인덱스당 userId terms 필터 스크롤 한 번으로 전체 로그를 사용자별로 나눔
+    grouped = {}
+    for start in range(0, len(user_ids), USER_DATA_TERMS_SIZE):
+        query = {"query": _users_filter(user_ids[start:start + USER_DATA_TERMS_SIZE])}
+        for doc in scan(es.options(request_timeout=timeout), index=index_name, query=query, _source=["userId", field]):
+            value = doc["_source"].get(field)
+            if value:
+                grouped.setdefault(int(doc["_source"]["userId"]), []).append(value)
+    return grouped
+
+
+def collect_users_data(user_ids: list, db: Session, es: Elasticsearch) -> dict:
+    # collect_user_data의 다건 버전: 사용자 수와 무관하게 SQL은 테이블당 한 번, ES는 인덱스당 terms 필터 한 번
+    # 반환: user_id -> (categories, histories, bookmarks, clicks, searches)
+    # 소스 하나라도 실패하면 빈 결과로 대체하지 않고 UserDataCollectionError 발생
+    engine = db.get_bind()
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+
+    sources = {
+        "categories": (_fetch_sql_bulk, engine, CATEGORY_BULK_SQL),
+        "histories": (_fetch_sql_bulk, engine, HISTORY_BULK_SQL),
+        "bookmarks": (_fetch_sql_bulk, engine, BOOKMARK_BULK_SQL),
+    }
+    if USER_LOG_FETCH_MODE == "scan":
+        sources["clicks"] = (_scan_logs_bulk, es, "store-click-log", "storeName")
+        sources["searches"] = (_scan_logs_bulk, es, "search-log", "searchKeyword")
+    else:
+        sources["clicks"] = (_aggregate_logs_bulk, es, "store-click-log", USER_LOG_CLICK_FIELD)
+        sources["searches"] = (_aggregate_logs_bulk, es, "search-log", USER_LOG_SEARCH_FIELD)
+    # 페이지 수가 사용자 수에 비례하므로 소스 전체가 아니라 SQL/ES 요청마다 타임아웃을 적용
+    futures = {
+        name: _executor.submit(fn, *args, user_ids, USER_DATA_BULK_TIMEOUT)
+        for name, (fn, *args) in sources.items()
+    }
+
+    results = {}
+    failed = []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.error(f"사용자 데이터 일괄 조회 실패 (source: {name}, users: {len(user_ids)}): {e}")
+            failed.append(name)
+    if failed:
+        raise UserDataCollectionError(
+            f"사용자 데이터 일괄 조회 실패 (sources: {', '.join(failed)}, users: {len(user_ids)})"
+        )
+
+    return {
+        user_id: (
+            results["categories"].get(user_id, []),
+            results["histories"].get(user_id, []),
+            results["bookmarks"].get(user_id, []),
+            results["clicks"].get(user_id, []),
+            results["searches"].get(user_id, [])
+        )
+        for user_id in user_ids
+    }
+
+
+async def _afetch_sql(sql, user_id: int, timeout: float) -> list:
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        return (await conn.execute(sql, {"user_id": user_id})).scalars().all()
+
+
+async def _afetch_scan(aes: AsyncElasticsearch, index_name: str, field: str, user_id: int, timeout: float) -> list:
+    values = []
+    async for doc in async_scan(aes.options(request_timeout=timeout), index=index_name, query=_user_query(user_id)):
+        value = doc["_source"].get(field)
+        if value:
+            values.append(value)
+    return values
+
+
+async def _afetch_logs(aes: AsyncElasticsearch, user_id: int, timeout: float) -> tuple[list, list]:
+    response = await aes.options(request_timeout=timeout).search(**_log_counts_request(user_id))
+    clicks, searches = _parse_log_counts(response)
+    return expand_by_frequency(clicks), expand_by_frequency(searches)
+
+
+async def acollect_user_data(user_id: int, aes: AsyncElasticsearch) -> tuple[tuple[list, list, list, list, list], bool]:
+    # collect_user_data의 비동기 버전: 스레드 대신 이벤트 루프에서 소스를 동시에 조회
+    # 반환: ((categories, histories, bookmarks, clicks, searches), 모든 소스 조회 성공 여부)
+    # 실패한 소스는 빈 결과로 대체하고, 모든 소스가 실패하면 UserDataCollectionError 발생
+    sources = {
+        "categories": (_afetch_sql(CATEGORY_SQL, user_id, USER_DATA_SQL_TIMEOUT), USER_DATA_SQL_TIMEOUT),
+        "histories": (_afetch_sql(HISTORY_SQL, user_id, USER_DATA_SQL_TIMEOUT), USER_DATA_SQL_TIMEOUT),
+        "bookmarks": (_afetch_sql(BOOKMARK_SQL, user_id, USER_DATA_SQL_TIMEOUT), USER_DATA_SQL_TIMEOUT),
+    }
+    if USER_LOG_FETCH_MODE == "scan":
+        sources["clicks"] = (
+            _afetch_scan(aes, "store-click-log", "storeName", user_id, USER_DATA_ES_TIMEOUT), USER_DATA_ES_TIMEOUT
+        )
+        sources["searches"] = (
+            _afetch_scan(aes, "search-log", "searchKeyword", user_id, USER_DATA_ES_TIMEOUT), USER_DATA_ES_TIMEOUT
+        )
+    else:
+        sources["logs"] = (_afetch_logs(aes, user_id, USER_DATA_ES_TIMEOUT), USER_DATA_ES_TIMEOUT)
+
+    names = list(sources)
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(coro, timeout) for coro, timeout in sources.values()),
+        return_exceptions=True
+    )
+
+    results = {}
+    failed = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.error(f"사용자 데이터 조회 시간 초과 (source: {name}, user_id: {user_id})")
+        elif isinstance(outcome, Exception):
+            logger.error(f"사용자 데이터 조회 실패 (source: {name}, user_id: {user_id}): {outcome}")
+        else:
+            results[name] = outcome
+            continue
+        failed.append(name)
+        results[name] = ([], []) if name == "logs" else []
+
+    if len(failed) == len(names):
+        raise UserDataCollectionError(f"사용자 데이터 조회 실패 (모든 소스, user_id: {user_id})")
+
+    if "logs" in results:
+        results["clicks"], results["searches"] = results.pop("logs")
+
+    return (
+        results["categories"],
+        results["histories"],
+        results["bookmarks"],
+        results["clicks"],
+        results["searches"]
+    ), not failed
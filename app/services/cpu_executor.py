@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import os
+
+# 임베딩 인코딩, ALS/벡터 점수 계산처럼 CPU를 쓰는 작업 전용 스레드 풀
+# 이벤트 루프와 I/O용 기본 스레드 풀이 막히지 않도록 분리 (torch/numpy 연산은 GIL을 놓고 실행됨)
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(os.cpu_count() or 4)))
+
+_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu")
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
@@ -0,0 +1,124 @@
+import numpy as np
+import threading
+import os
+import logging
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv(
+    "EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+# torch | onnx | quantized(int8 dynamic quantization)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# 0이면 torch 기본값 사용
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_NUM_INTEROP_THREADS = int(os.getenv("TORCH_NUM_INTEROP_THREADS", "0"))
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _configure_torch_threads():
+    import torch
+
+    if TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    if TORCH_NUM_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(TORCH_NUM_INTEROP_THREADS)
+        except RuntimeError as e:
+            # interop 스레드 수는 병렬 작업이 시작되기 전에만 바꿀 수 있음
+            logger.warning(f"torch interop 스레드 설정 실패: {e}")
+
+
+def load_model(backend: str = EMBEDDING_BACKEND, fallback: bool = True):
+    # fallback=False이면 요청한 백엔드를 로드하지 못했을 때 torch로 대체하지 않고 예외 발생
+    from sentence_transformers import SentenceTransformer
+
+    _configure_torch_threads()
+
+    if backend == "onnx":
+        try:
+            model_kwargs = {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+            return SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx", model_kwargs=model_kwargs)
+        except Exception as e:
+            # optimum[onnxruntime] 미설치 등으로 실패하면 torch 백엔드로 대체
+            if not fallback:
+                raise
+            logger.error(f"ONNX 백엔드 로드 실패, torch 백엔드로 대체합니다: {e}")
+            backend = "torch"
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu" if backend == "quantized" else None)
+
+    if backend == "quantized":
+        import torch
+
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif backend != "torch":
+        if not fallback:
+            raise ValueError(f"알 수 없는 EMBEDDING_BACKEND '{backend}'")
+        logger.warning(f"알 수 없는 EMBEDDING_BACKEND '{backend}', torch 백엔드를 사용합니다.")
+    return model
+
+
+def get_model():
+    # 워커당 한 번만 로드해서 모든 라우터가 공유
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
+                logger.info(f"임베딩 모델 로드 완료 (backend: {EMBEDDING_BACKEND})")
+    return _model
+
+
+def encode_text(text: str) -> np.ndarray:
+    return get_model().encode(text, convert_to_numpy=True, show_progress_bar=False)
+
+
+def build_brand_text(brand_name: str | None, description: str | None, category_name: str | None) -> str:
+    return f"{brand_name or ''}. {description or ''}. {category_name or ''}"
+
+
+def is_stale(embedding, *source_modified_at) -> bool:
+    # 임베딩이 없거나, 원본(브랜드/카테고리)이 임베딩 생성 이후 수정된 경우
+    if embedding is None or embedding.updated_at is None:
+        return True
+    return any(
+        modified_at is not None and modified_at > embedding.updated_at
+        for modified_at in source_modified_at
+    )
+
+
+def encode_texts(
+    texts: list[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    cache: dict | None = None
+) -> np.ndarray:
+    # 같은 텍스트는 한 번만 인코딩하고 결과를 원래 순서대로 펼쳐서 반환
+    # cache가 주어지면 청크 단위 호출 사이에서도 이미 인코딩한 텍스트를 재사용
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    if cache is None:
+        cache = {}
+
+    unique_texts = list(dict.fromkeys(texts))
+    missing = [text for text in unique_texts if text not in cache]
+    if missing:
+        vectors = get_model().encode(
+            missing,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        cache.update(zip(missing, vectors))
+    logger.info(
+        f"임베딩 생성: 입력 {len(texts)}건, 고유 텍스트 {len(unique_texts)}건, "
+        f"신규 인코딩 {len(missing)}건 (batch_size={batch_size})"
+    )
+    return np.stack([cache[text] for text in texts])
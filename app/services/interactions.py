@@ -0,0 +1,408 @@
+import numpy as np
+from array import array
+from datetime import datetime
+from scipy.sparse import coo_matrix, csr_matrix
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from app.models import Store
+from app.database.es import ES_LOG_TIMESTAMP_FIELD
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# composite 집계 한 페이지당 (user, item, day) 버킷 수
+ES_COMPOSITE_PAGE_SIZE = int(os.getenv("ES_COMPOSITE_PAGE_SIZE", "5000"))
+SQL_FETCH_PAGE_SIZE = int(os.getenv("SQL_FETCH_PAGE_SIZE", "10000"))
+
+# 신호별 가중치 (예: "store_click=1,brand_click=1,visit=3,bookmark=5")
+ALS_SIGNAL_WEIGHTS = os.getenv("ALS_SIGNAL_WEIGHTS", "store_click=1,brand_click=1,visit=3,bookmark=5")
+# 상호작용 가중치가 절반이 되는 기간(일), 0이면 감쇠 없음
+ALS_DECAY_HALF_LIFE_DAYS = float(os.getenv("ALS_DECAY_HALF_LIFE_DAYS", "30"))
+# log: 1 + alpha * log(1 + w / epsilon), linear: alpha * w
+ALS_CONFIDENCE = os.getenv("ALS_CONFIDENCE", "log").lower()
+ALS_CONFIDENCE_ALPHA = float(os.getenv("ALS_CONFIDENCE_ALPHA", "2.0"))
+ALS_CONFIDENCE_EPSILON = float(os.getenv("ALS_CONFIDENCE_EPSILON", "1.0"))
+
+SIGNALS = ("store_click", "brand_click", "visit", "bookmark")
+
+VISIT_SQL = """
+    SELECT uh.user_id, s.brand_id, date_trunc('day', uh.created_at) AS day, COUNT(*) AS cnt
+    FROM usage_history uh
+    JOIN store s ON uh.store_id = s.id
+    WHERE uh.user_id IS NOT NULL AND s.brand_id IS NOT NULL AND uh.created_at IS NOT NULL
+    {time_filter}
+    GROUP BY uh.user_id, s.brand_id, date_trunc('day', uh.created_at)
+"""
+
+BOOKMARK_SQL = """
+    SELECT bm.user_id, bm.brand_id, date_trunc('day', bm.created_at) AS day, COUNT(*) AS cnt
+    FROM bookmark bm
+    WHERE bm.user_id IS NOT NULL AND bm.brand_id IS NOT NULL AND bm.created_at IS NOT NULL
+    {time_filter}
+    GROUP BY bm.user_id, bm.brand_id, date_trunc('day', bm.created_at)
+"""
+
+# fold-in 용: 한 사용자의 (since 이후) 브랜드별 방문/즐겨찾기 건수
+USER_VISIT_SQL = """
+    SELECT s.brand_id, COUNT(*) AS cnt
+    FROM usage_history uh
+    JOIN store s ON uh.store_id = s.id
+    WHERE uh.user_id = :user_id AND s.brand_id IS NOT NULL
+    {time_filter}
+    GROUP BY s.brand_id
+"""
+
+USER_BOOKMARK_SQL = """
+    SELECT bm.brand_id, COUNT(*) AS cnt
+    FROM bookmark bm
+    WHERE bm.user_id = :user_id AND bm.brand_id IS NOT NULL
+    {time_filter}
+    GROUP BY bm.brand_id
+"""
+
+
+def parse_signal_weights(value: str) -> dict:
+    weights = {signal: 0.0 for signal in SIGNALS}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        if name.strip() not in weights:
+            raise ValueError(f"알 수 없는 상호작용 신호: {name.strip()}")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+class InteractionConfig:
+    def __init__(
+        self,
+        signal_weights: dict | None = None,
+        half_life_days: float = ALS_DECAY_HALF_LIFE_DAYS,
+        confidence: str = ALS_CONFIDENCE,
+        alpha: float = ALS_CONFIDENCE_ALPHA,
+        epsilon: float = ALS_CONFIDENCE_EPSILON
+    ):
+        self.signal_weights = signal_weights or parse_signal_weights(ALS_SIGNAL_WEIGHTS)
+        self.half_life_days = half_life_days
+        self.confidence = confidence
+        self.alpha = alpha
+        self.epsilon = epsilon
+
+    @classmethod
+    def baseline(cls):
+        # 변경 전 방식: 매장/브랜드 클릭 1회 = 1, 감쇠 없음, 건수를 그대로 confidence로 사용
+        return cls(
+            signal_weights=parse_signal_weights("store_click=1,brand_click=1"),
+            half_life_days=0,
+            confidence="linear",
+            alpha=1.0
+        )
+
+    def __repr__(self):
+        return (
+            f"InteractionConfig(weights={self.signal_weights}, half_life_days={self.half_life_days}, "
+            f"confidence={self.confidence}, alpha={self.alpha}, epsilon={self.epsilon})"
+        )
+
+
+def _epoch_seconds(value: datetime) -> float:
+    # tz 없는 timestamp는 UTC로 간주
+    if value.tzinfo is not None:
+        return value.timestamp()
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def ensure_log_fields(es: Elasticsearch, index_name: str, fields: dict):
+    # fields: 필드 이름 -> 기대하는 매핑 타입 (None이면 존재 여부만 확인)
+    # composite 집계는 필드가 없는 문서를 조용히 건너뛰므로, 매핑이 다르면 클릭 없이 학습되지 않도록 미리 실패시킴
+    response = es.indices.get_field_mapping(index=index_name, fields=list(fields))
+    mappings = dict(response)
+    if not mappings:
+        raise RuntimeError(f"{index_name}: 인덱스를 찾을 수 없습니다.")
+    for concrete_index, body in mappings.items():
+        found = body.get("mappings", {})
+        for field, expected_type in fields.items():
+            if field not in found:
+                raise RuntimeError(f"{concrete_index}: 필드 {field} 매핑이 없습니다.")
+            field_type = found[field]["mapping"][field.split(".")[-1]].get("type")
+            if expected_type is not None and field_type != expected_type:
+                raise RuntimeError(f"{concrete_index}: 필드 {field} 타입이 {expected_type}가 아닙니다 ({field_type}).")
+
+
+def fetch_pair_counts(
+    es: Elasticsearch,
+    index_name: str,
+    item_field: str,
+    since: datetime | None = None,
+    until: datetime | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # 원본 이벤트 대신 (userId, item, 일자)별 건수만 composite 집계로 페이지 단위 조회
+    # 결과는 바로 numpy 배열로 쌓이므로 메모리는 이벤트 수가 아니라 고유 조합 수에 비례
+    ensure_log_fields(es, index_name, {"userId": None, item_field: None, ES_LOG_TIMESTAMP_FIELD: "date"})
+    users, items, days, counts = array("q"), array("q"), array("d"), array("d")
+    composite = {
+        "size": ES_COMPOSITE_PAGE_SIZE,
+        "sources": [
+            {"user": {"terms": {"field": "userId"}}},
+            {"item": {"terms": {"field": item_field}}},
+            {"day": {"date_histogram": {"field": ES_LOG_TIMESTAMP_FIELD, "calendar_interval": "1d"}}}
+        ]
+    }
+    time_range = {}
+    if since is not None:
+        time_range["gte"] = since.isoformat()
+    if until is not None:
+        time_range["lt"] = until.isoformat()
+    query = {"range": {ES_LOG_TIMESTAMP_FIELD: time_range}} if time_range else {"match_all": {}}
+
+    while True:
+        response = es.search(index=index_name, size=0, query=query, aggs={"pairs": {"composite": composite}})
+        pairs = response["aggregations"]["pairs"]
+        for bucket in pairs["buckets"]:
+            users.append(int(bucket["key"]["user"]))
+            items.append(int(bucket["key"]["item"]))
+            # date_histogram 키는 epoch milliseconds
+            days.append(bucket["key"]["day"] / 1000.0)
+            counts.append(bucket["doc_count"])
+        after_key = pairs.get("after_key")
+        if not pairs["buckets"] or after_key is None:
+            break
+        composite["after"] = after_key
+
+    logger.info(f"{index_name}: 고유 (user, {item_field}, day) 조합 {len(users)}개 조회")
+    return (
+        np.frombuffer(users, dtype=np.int64),
+        np.frombuffer(items, dtype=np.int64),
+        np.frombuffer(days, dtype=np.float64),
+        np.frombuffer(counts, dtype=np.float64)
+    )
+
+
+def fetch_sql_counts(
+    db: Session,
+    sql: str,
+    column: str,
+    since: datetime | None = None,
+    until: datetime | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # (user, brand, day)별 건수를 서버 사이드 커서로 나눠 받아 numpy 배열로 누적
+    filters = []
+    params = {}
+    if since is not None:
+        filters.append(f"AND {column} >= :since")
+        params["since"] = since
+    if until is not None:
+        filters.append(f"AND {column} < :until")
+        params["until"] = until
+
+    users, items, days, counts = array("q"), array("q"), array("d"), array("d")
+    result = db.execute(
+        text(sql.format(time_filter=" ".join(filters))).execution_options(stream_results=True),
+        params
+    )
+    for rows in result.partitions(SQL_FETCH_PAGE_SIZE):
+        for user_id, brand_id, day, count in rows:
+            users.append(user_id)
+            items.append(brand_id)
+            days.append(_epoch_seconds(day))
+            counts.append(count)
+    return (
+        np.frombuffer(users, dtype=np.int64),
+        np.frombuffer(items, dtype=np.int64),
+        np.frombuffer(days, dtype=np.float64),
+        np.frombuffer(counts, dtype=np.float64)
+    )
+
+
+def load_store_brand_map(db: Session) -> tuple[np.ndarray, np.ndarray]:
+    rows = (
+        db.query(Store.id, Store.brand_id)
+        .filter(Store.brand_id.isnot(None))
+        .order_by(Store.id)
+        .all()
+    )
+    store_ids = np.fromiter((store_id for store_id, _ in rows), dtype=np.int64, count=len(rows))
+    brand_ids = np.fromiter((brand_id for _, brand_id in rows), dtype=np.int64, count=len(rows))
+    return store_ids, brand_ids
+
+
+def map_stores_to_brands(store_ids: np.ndarray, sorted_store_ids: np.ndarray, brand_ids: np.ndarray) -> np.ndarray:
+    # 정렬된 매장 id 배열에서 searchsorted로 brand_id 매핑, 매핑 불가한 매장은 -1
+    if len(sorted_store_ids) == 0:
+        return np.full(len(store_ids), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_store_ids, store_ids), len(sorted_store_ids) - 1)
+    return np.where(sorted_store_ids[pos] == store_ids, brand_ids[pos], -1)
+
+
+class InteractionBuilder:
+    # 신호별 (user, brand, day, count)를 모아 신호 가중치 * 시간 감쇠를 벡터 연산으로 적용
+    def __init__(self, config: InteractionConfig | None = None):
+        self.config = config or InteractionConfig()
+
+    def decay(self, ages_days: np.ndarray) -> np.ndarray:
+        if self.config.half_life_days <= 0:
+            return np.ones_like(ages_days)
+        return np.power(0.5, np.maximum(ages_days, 0.0) / self.config.half_life_days)
+
+    def to_confidence(self, weights):
+        # 가중치 합 -> ALS confidence, 희소행렬이면 data만 변환
+        if isinstance(weights, csr_matrix):
+            matrix = weights.copy()
+            matrix.data = self.to_confidence(matrix.data)
+            return matrix
+        weights = np.asarray(weights, dtype=np.float32)
+        if self.config.confidence == "log":
+            return (1.0 + self.config.alpha * np.log1p(weights / self.config.epsilon)).astype(np.float32)
+        return (self.config.alpha * weights).astype(np.float32)
+
+    def load(
+        self,
+        db: Session,
+        es: Elasticsearch,
+        since: datetime | None = None,
+        until: datetime | None = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        weights = self.config.signal_weights
+        reference_ts = _epoch_seconds(until or datetime.utcnow())
+
+        parts = []
+        if weights["store_click"] > 0:
+            users, store_ids, days, counts = fetch_pair_counts(es, "store-click-log", "storeId", since, until)
+            # 매장 클릭은 brand_id로 변환해서 브랜드 단위로 합침
+            brand_ids = map_stores_to_brands(store_ids, *load_store_brand_map(db))
+            valid = brand_ids >= 0
+            parts.append(("store_click", users[valid], brand_ids[valid], days[valid], counts[valid]))
+        if weights["brand_click"] > 0:
+            parts.append(("brand_click", *fetch_pair_counts(es, "brand-click-log", "brandId", since, until)))
+        if weights["visit"] > 0:
+            parts.append(("visit", *fetch_sql_counts(db, VISIT_SQL, "uh.created_at", since, until)))
+        if weights["bookmark"] > 0:
+            parts.append(("bookmark", *fetch_sql_counts(db, BOOKMARK_SQL, "bm.created_at", since, until)))
+
+        if not parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float64)
+
+        user_ids, brand_ids, values = [], [], []
+        for signal, users, items, days, counts in parts:
+            ages_days = (reference_ts - days) / 86400.0
+            user_ids.append(users)
+            brand_ids.append(items)
+            values.append(weights[signal] * counts * self.decay(ages_days))
+            logger.info(f"상호작용 신호 {signal}: {len(users)}개 조합")
+
+        return np.concatenate(user_ids), np.concatenate(brand_ids), np.concatenate(values)
+
+
+def build_user_item_matrix(
+    user_ids: np.ndarray,
+    item_ids: np.ndarray,
+    values: np.ndarray
+) -> tuple[csr_matrix, np.ndarray, np.ndarray]:
+    # 정렬된 고유 id 배열의 위치를 행/열 코드로 사용, 같은 (user, item)은 합산
+    unique_users, user_codes = np.unique(user_ids, return_inverse=True)
+    unique_items, item_codes = np.unique(item_ids, return_inverse=True)
+    matrix = coo_matrix(
+        (values.astype(np.float32), (user_codes, item_codes)),
+        shape=(len(unique_users), len(unique_items))
+    ).tocsr()
+    matrix.sum_duplicates()
+    return matrix, unique_users, unique_items
+
+
+def _user_interactions_request(user_id: int, since, size: int) -> dict:
+    filters = [{"term": {"userId": user_id}}]
+    if since is not None:
+        filters.append({"range": {ES_LOG_TIMESTAMP_FIELD: {"gte": since.isoformat()}}})
+    return {
+        "index": "store-click-log,brand-click-log",
+        "size": 0,
+        "query": {"bool": {"filter": filters}},
+        "aggs": {
+            # 인덱스별로 나눠서 집계해야 같은 클릭이 매장/브랜드로 중복 집계되지 않음
+            "stores": {
+                "filter": {"prefix": {"_index": "store-click-log"}},
+                "aggs": {"ids": {"terms": {"field": "storeId", "size": size}}}
+            },
+            "brands": {
+                "filter": {"prefix": {"_index": "brand-click-log"}},
+                "aggs": {"ids": {"terms": {"field": "brandId", "size": size}}}
+            }
+        }
+    }
+
+
+def _interaction_buckets(response) -> tuple[list, list]:
+    aggregations = response.get("aggregations", {})
+    store_buckets = aggregations.get("stores", {}).get("ids", {}).get("buckets", [])
+    brand_buckets = aggregations.get("brands", {}).get("ids", {}).get("buckets", [])
+    return store_buckets, brand_buckets
+
+
+def _store_brand_query(store_buckets: list):
+    return select(Store.id, Store.brand_id).where(
+        Store.id.in_([int(bucket["key"]) for bucket in store_buckets]), Store.brand_id.isnot(None)
+    )
+
+
+def _combine_interactions(
+    store_buckets: list,
+    brand_buckets: list,
+    store_to_brand: dict,
+    sql_counts: dict,
+    config: InteractionConfig
+) -> tuple[np.ndarray, np.ndarray]:
+    # sql_counts: 신호(visit, bookmark) -> [(brand_id, 건수)]
+    store_weight = config.signal_weights["store_click"]
+    brand_weight = config.signal_weights["brand_click"]
+    brand_ids = [int(bucket["key"]) for bucket in brand_buckets]
+    weights = [brand_weight * bucket["doc_count"] for bucket in brand_buckets]
+    for bucket in store_buckets:
+        brand_id = store_to_brand.get(int(bucket["key"]))
+        if brand_id is not None:
+            brand_ids.append(brand_id)
+            weights.append(store_weight * bucket["doc_count"])
+    for signal, rows in sql_counts.items():
+        for brand_id, count in rows:
+            brand_ids.append(brand_id)
+            weights.append(config.signal_weights[signal] * count)
+    return np.asarray(brand_ids, dtype=np.int64), np.asarray(weights, dtype=np.float64)
+
+
+def _user_sql_query(sql: str, column: str, user_id: int, since) -> tuple:
+    params = {"user_id": user_id}
+    time_filter = ""
+    if since is not None:
+        time_filter = f"AND {column} >= :since"
+        params["since"] = since
+    return text(sql.format(time_filter=time_filter)), params
+
+
+async def afetch_user_interactions(
+    db: AsyncSession,
+    aes: AsyncElasticsearch,
+    user_id: int,
+    since=None,
+    size: int = 200,
+    config: InteractionConfig | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    # 한 사용자의 (since 이후) 브랜드별 상호작용 가중치 조회 (fold-in 용)
+    # 클릭은 검색 한 번, 방문/즐겨찾기는 학습(InteractionBuilder.load)과 같은 테이블에서 조회
+    # 학습 이후의 최근 이벤트만 다루므로 시간 감쇠는 생략하고 신호 가중치만 적용
+    config = config or InteractionConfig()
+    response = await aes.search(**_user_interactions_request(user_id, since, size))
+    store_buckets, brand_buckets = _interaction_buckets(response)
+    store_to_brand = dict((await db.execute(_store_brand_query(store_buckets))).all()) if store_buckets else {}
+
+    sql_counts = {}
+    for signal, sql, column in (
+        ("visit", USER_VISIT_SQL, "uh.created_at"),
+        ("bookmark", USER_BOOKMARK_SQL, "bm.created_at")
+    ):
+        if config.signal_weights[signal] > 0:
+            sql_counts[signal] = (await db.execute(*_user_sql_query(sql, column, user_id, since))).all()
+
+    return _combine_interactions(store_buckets, brand_buckets, store_to_brand, sql_counts, config)
@@ -0,0 +1,98 @@
+from sqlalchemy import text
+from app.database.connection import SessionLocal
+from app.services.scheduler import PeriodicTask
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORE_POPULARITY_REFRESH_INTERVAL = int(os.getenv("STORE_POPULARITY_REFRESH_INTERVAL", "600"))
+STORE_POPULARITY_AUTO_CREATE = os.getenv("STORE_POPULARITY_AUTO_CREATE", "1") == "1"
+# 여러 워커가 동시에 REFRESH 하지 않도록 잡는 advisory lock 키
+STORE_POPULARITY_LOCK_KEY = 724011
+
+# 매장별 클릭/방문 수와 정규화 점수를 미리 집계해두는 materialized view
+# 정규화는 기존 요청 쿼리와 같게 로그가 있는 매장들의 min/max 기준
+CREATE_STORE_POPULARITY_SQL = text("""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS store_popularity AS
+    WITH click_counts AS (
+        SELECT store_id, COUNT(*) AS click_count
+        FROM store_click_log
+        GROUP BY store_id
+    ),
+    visit_counts AS (
+        SELECT store_id, COUNT(*) AS visit_count
+        FROM usage_history
+        GROUP BY store_id
+    ),
+    click_stats AS (
+        SELECT MAX(click_count) AS max_clicks, MIN(click_count) AS min_clicks
+        FROM click_counts
+    ),
+    visit_stats AS (
+        SELECT MAX(visit_count) AS max_visits, MIN(visit_count) AS min_visits
+        FROM visit_counts
+    )
+    SELECT s.id AS store_id,
+        COALESCE(cc.click_count, 0) AS click_count,
+        COALESCE(vc.visit_count, 0) AS visit_count,
+        CASE
+            WHEN cs.max_clicks > cs.min_clicks THEN
+                (COALESCE(cc.click_count, 0) - cs.min_clicks)::float / (cs.max_clicks - cs.min_clicks)
+            ELSE 0
+        END AS normalized_click_score,
+        CASE
+            WHEN vs.max_visits > vs.min_visits THEN
+                (COALESCE(vc.visit_count, 0) - vs.min_visits)::float / (vs.max_visits - vs.min_visits)
+            ELSE 0
+        END AS normalized_visit_score
+    FROM store s
+    LEFT JOIN click_counts cc ON cc.store_id = s.id
+    LEFT JOIN visit_counts vc ON vc.store_id = s.id
+    CROSS JOIN click_stats cs
+    CROSS JOIN visit_stats vs
+""")
+
+# REFRESH ... CONCURRENTLY 에 필요한 unique index
+CREATE_STORE_POPULARITY_INDEX_SQL = text("""
+    CREATE UNIQUE INDEX IF NOT EXISTS store_popularity_store_id_idx
+    ON store_popularity (store_id)
+""")
+
+
+def ensure_store_popularity():
+    with SessionLocal() as db:
+        db.execute(CREATE_STORE_POPULARITY_SQL)
+        db.execute(CREATE_STORE_POPULARITY_INDEX_SQL)
+        db.commit()
+
+
+def refresh_store_popularity():
+    with SessionLocal() as db:
+        locked = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": STORE_POPULARITY_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            logger.info("다른 워커가 store_popularity 갱신 중이라 건너뜁니다.")
+            return
+        # CONCURRENTLY: 갱신 중에도 요청 쿼리가 막히지 않음
+        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY store_popularity"))
+        db.commit()
+    logger.info("store_popularity 갱신 완료")
+
+
+popularity_refresher = PeriodicTask(
+    "store-popularity",
+    STORE_POPULARITY_REFRESH_INTERVAL,
+    refresh_store_popularity,
+    run_immediately=False
+)
+
+
+def start_popularity_refresh():
+    if STORE_POPULARITY_AUTO_CREATE:
+        try:
+            ensure_store_popularity()
+        except Exception as e:
+            logger.error(f"store_popularity 생성 실패: {e}")
+    popularity_refresher.start()
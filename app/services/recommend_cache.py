@@ -0,0 +1,155 @@
+from app.database.redis_client import r_bin, ar_bin
+from app.services.cache_codec import pack, unpack
+from collections import defaultdict
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 1단계: 위치와 무관한 사용자별 추천 브랜드 순위
+RECOMMEND_BRAND_TTL = int(os.getenv("RECOMMEND_BRAND_TTL", "3600"))
+# 2단계: geohash 셀 + 반경별 /recommend 매장 결과
+RECOMMEND_STORE_TTL = int(os.getenv("RECOMMEND_STORE_TTL", "600"))
+# 셀 안의 다른 위치에도 같은 결과를 반환하므로 셀은 반경보다 충분히 작게 유지
+# 정밀도 8 = 약 38m x 19m 셀
+GEOHASH_PRECISION = int(os.getenv("GEOHASH_PRECISION", "8"))
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    use_lng = True
+    while len(chars) < precision:
+        value, value_range = (lng, lng_range) if use_lng else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        use_lng = not use_lng
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def brand_list_key(user_id: int) -> str:
+    return f"recommendation:brands:user:{user_id}"
+
+
+def nearby_result_key(user_id: int, cell: str, radius_km: float, strategy: str = "auto") -> str:
+    return f"recommendation:nearby:user:{user_id}:{strategy}:{cell}:{radius_km:g}"
+
+
+def user_result_keys_key(user_id: int) -> str:
+    # 사용자별 위치 결과 키 목록 (무효화 시 keyspace 전체를 SCAN하지 않도록 함)
+    return f"recommendation:keys:user:{user_id}"
+
+
+class CacheStats:
+    # 워커 프로세스 단위 캐시 계층별 hit/miss 카운터
+    def __init__(self):
+        self._counts = defaultdict(lambda: {"hit": 0, "miss": 0})
+        self._lock = threading.Lock()
+
+    def record(self, layer: str, hit: bool):
+        with self._lock:
+            self._counts[layer]["hit" if hit else "miss"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {layer: dict(counts) for layer, counts in self._counts.items()}
+
+
+cache_stats = CacheStats()
+
+
+def _unpack(layer: str, cached: bytes | None):
+    # 형식이 다른 값(예: 이전 JSON 캐시)은 미스로 처리하고 새 값으로 덮어씀
+    if cached is None:
+        return None
+    try:
+        return unpack(cached)
+    except Exception as e:
+        logger.warning(f"Redis 캐시 값 해석 실패 (layer: {layer}): {e}")
+        return None
+
+
+async def aget_cached(layer: str, key: str):
+    try:
+        cached = await ar_bin.get(key)
+    except Exception as e:
+        logger.error(f"Redis 캐시 확인 중 오류 (layer: {layer}): {e}")
+        return None
+    value = _unpack(layer, cached)
+    cache_stats.record(layer, value is not None)
+    return value
+
+
+def _pack_brand_list(results: list) -> bytes:
+    # [[brand_id, score], ...]를 id 배열/점수(float32) 배열로 나눠 저장
+    return pack([[int(brand_id) for brand_id, _ in results], [float(score) for _, score in results]], single_float=True)
+
+
+def _unpack_brand_list(cached: bytes | None) -> list | None:
+    value = _unpack("brands", cached)
+    if value is None:
+        return None
+    brand_ids, scores = value
+    return [[brand_id, score] for brand_id, score in zip(brand_ids, scores)]
+
+
+async def aget_brand_list(user_id: int) -> list | None:
+    try:
+        cached = await ar_bin.get(brand_list_key(user_id))
+    except Exception as e:
+        logger.error(f"Redis 캐시 확인 중 오류 (layer: brands): {e}")
+        return None
+    results = _unpack_brand_list(cached)
+    cache_stats.record("brands", results is not None)
+    return results
+
+
+async def aset_brand_list(user_id: int, results: list, ttl: int = RECOMMEND_BRAND_TTL):
+    try:
+        await ar_bin.setex(brand_list_key(user_id), ttl, _pack_brand_list(results))
+    except Exception as e:
+        logger.error(f"Redis 캐싱 실패 (layer: brands): {e}")
+
+
+def set_brand_lists(entries: list, ttl: int = RECOMMEND_BRAND_TTL):
+    # 배치 작업용: entries [(user_id, [[brand_id, score], ...])]를 파이프라인 한 번으로 저장
+    pipe = r_bin.pipeline(transaction=False)
+    for user_id, results in entries:
+        pipe.setex(brand_list_key(user_id), ttl, _pack_brand_list(results))
+    pipe.execute()
+
+
+async def aset_user_result(user_id: int, layer: str, key: str, ttl: int, value):
+    # 결과와 함께 사용자별 키 목록에도 추가 (목록은 마지막 결과와 같이 만료)
+    try:
+        keys_key = user_result_keys_key(user_id)
+        pipe = ar_bin.pipeline(transaction=False)
+        pipe.setex(key, ttl, pack(value))
+        pipe.sadd(keys_key, key)
+        pipe.expire(keys_key, ttl)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Redis 캐싱 실패 (layer: {layer}): {e}")
+
+
+async def ainvalidate_user_results(user_id: int):
+    # 사용자의 브랜드 순위와 모든 위치별 결과 캐시 삭제
+    keys_key = user_result_keys_key(user_id)
+    keys = [brand_list_key(user_id), keys_key, *(await ar_bin.smembers(keys_key))]
+    await ar_bin.delete(*keys)
@@ -1,138 +1,191 @@
 import numpy as np
-import pandas as pd
-from scipy.sparse import coo_matrix
 from implicit.als import AlternatingLeastSquares
 from sqlalchemy.orm import Session
-from app.models import BrandClickLog, StoreClickLog, BrandEmbedding, Store
-from elasticsearch import Elasticsearch
-from elasticsearch.helpers import scan
-from app.database.es import es
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.interactions import (
+    InteractionBuilder, build_user_item_matrix, afetch_user_interactions
+)
+from app.services.als_foldin import ALS_FOLDIN_EXISTING, FoldInCache, fold_in_user
+from app.services.brand_index import brand_index
+from app.services.score_fusion import HYBRID_ALS_WEIGHT, HYBRID_VECTOR_WEIGHT, HYBRID_NORMALIZATION, fuse_scores
+from app.services.als_store import (
+    ALS_FACTORS, ALS_REGULARIZATION, ALS_ITERATIONS, ALSModelState, ALSArtifactStore, als_store
+)
+from app.services.cpu_executor import run_cpu
+from app.database.es import es, aes
+from datetime import datetime
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def fit_als(user_items, builder: InteractionBuilder) -> AlternatingLeastSquares:
+    # user_items 에는 가중치 합이 들어 있고, 학습에는 confidence로 변환해서 사용
+    model = AlternatingLeastSquares(
+        factors=ALS_FACTORS, regularization=ALS_REGULARIZATION, iterations=ALS_ITERATIONS
+    )
+    model.fit(builder.to_confidence(user_items))
+    if not isinstance(model.user_factors, np.ndarray):
+        # GPU로 학습된 경우 서빙은 numpy 팩터로 처리
+        model = model.to_cpu()
+    return model
+
+
 class HybridRecommender:
-    def __init__(self):
-        self.model = None
-        self.user_factors = None
-        self.item_factors = None
-        self.item_id_to_index = {}
-        self.index_to_item_id = {}
-        self.user_id_to_code = {}
-        self.code_to_user_id = {}
+    def __init__(self, artifact_store: ALSArtifactStore = als_store):
+        self.state = None
+        self.artifact_store = artifact_store
         self.es = es
-
-    # 로그 가져오는 함수
-    def get_logs_from_es(self, index_name: str):
-        logs = []
+        self.aes = aes
+        self.brand_index = brand_index
+        self._train_lock = threading.Lock()
+        self.foldin_cache = FoldInCache()
+        self.interaction_builder = InteractionBuilder()
+
+    def load_persisted_model(self) -> bool:
+        # 마지막으로 저장된(CURRENT) 모델을 mmap으로 열어서 바로 서빙
+        current = self.artifact_store.current_version()
+        if current is None:
+            return False
+        if self.state is not None and self.state.version == current:
+            return True
         try:
-            for doc in scan(self.es, index=index_name):
-                logs.append(doc["_source"])
+            state = self.artifact_store.load(current)
         except Exception as e:
-            logger.error(f"Elasticsearch 로그 조회 실패 (index: {index_name}): {e}")
-        return logs
+            logger.error(f"저장된 ALS 모델 로드 실패 (version: {current}): {e}")
+            return False
+        self.state = state
+        logger.info(f"ALS 모델 로드 완료 (version: {current})")
+        return True
 
     def train_model(self, db: Session):
-        store_logs = self.get_logs_from_es("store-click-log")
-        brand_logs = self.get_logs_from_es("brand-click-log")
-
-        combined_data = []
-
-        # Store 클릭 로그 : store_id -> brand_id로 매핑
-        store_ids = [log["storeId"] for log in store_logs]
-        stores_with_brands = db.query(Store.id, Store.brand_id).filter(
-            Store.id.in_(store_ids),
-            Store.brand_id.isnot(None)
-        ).all()
-
-        store_to_brand = {store_id: brand_id for store_id, brand_id in stores_with_brands}
-
-        for log in store_logs:
-            brand_id = store_to_brand.get(log["storeId"])
-            if brand_id:
-                combined_data.append({'user_id': log["userId"], "brand_id": brand_id})
-
-        # Brand 클릭 로그
-        for log in brand_logs:
-            combined_data.append({'user_id': log["userId"], "brand_id": log["brandId"]})
-
-        if not combined_data:
+        # 여러 워커 중 잠금을 잡은 한 곳에서만 학습, 학습 중에도 기존 state로 계속 서빙
+        lock_file = self.artifact_store.try_lock_training()
+        if lock_file is None:
+            logger.info("다른 워커가 ALS 학습 중이라 건너뜁니다.")
             return
-        
-        df = pd.DataFrame(combined_data)
-        df['value'] = 1
-        df = df.groupby(['user_id', 'brand_id']).size().reset_index(name='value')
-
-        # 카테고리 코드화 
-        df['user_code'] = df['user_id'].astype('category').cat.codes
-        df['brand_code'] = df['brand_id'].astype('category').cat.codes
-
-        # ID, 코드 매핑
-        self.item_id_to_index = {
-            brand_id: code for brand_id, code in zip(df['brand_id'], df['brand_code'])
-        }
-        self.index_to_item_id = {
-            code: brand_id for brand_id, code in zip(df['brand_id'], df['brand_code'])
-        }
-        self.user_id_to_code = {
-            user_id: code for user_id, code in zip(df['user_id'], df['user_code'])
-        }
-        self.code_to_user_id = {
-            code: user_id for user_id, code in zip(df['user_id'], df['user_code'])
-        }           
-
-        # 희소행렬 생성 후 학습
-        sparse_matrix = coo_matrix((df['value'], (df['user_code'], df['brand_code'])))
-        self.model = AlternatingLeastSquares(factors=50, regularization=0.01, iterations=20)
-        self.model.fit(sparse_matrix)
-
-        self.user_items = sparse_matrix.tocsr()
-        self.user_factors = self.model.user_factors
-        self.item_factors = self.model.item_factors
-
-    def get_als_scores(self, user_id: int, top_k: int = 20):
-        if not self.model or user_id not in self.user_id_to_code:
-            return {}
-        user_code = self.user_id_to_code[user_id]
-        indices, values = self.model.recommend(
-            userid=user_code,
-            user_items=self.user_items[user_code],
-            N=top_k,
-            filter_already_liked_items=False
+        if not self._train_lock.acquire(blocking=False):
+            lock_file.close()
+            logger.info("ALS 학습이 이미 진행 중이라 건너뜁니다.")
+            return
+        try:
+            state = self._fit(db)
+            if state is None:
+                return
+            try:
+                # 저장한 버전을 mmap으로 다시 열어서 다른 워커와 같은 페이지 캐시를 공유
+                version = self.artifact_store.save(state)
+                state = self.artifact_store.load(version)
+            except Exception as e:
+                logger.error(f"ALS 모델 저장 실패, 메모리의 모델로 서빙합니다: {e}")
+            self.state = state
+            logger.info(
+                f"ALS 모델 교체 완료 (version: {state.version}, "
+                f"users: {len(state.user_ids)}, items: {len(state.item_ids)})"
+            )
+        finally:
+            self._train_lock.release()
+            lock_file.close()
+
+    def _fit(self, db: Session) -> ALSModelState | None:
+        # 신호 가중치 * 시간 감쇠를 적용한 (user, brand) 가중치로 희소행렬 구성
+        user_ids, brand_ids, weights = self.interaction_builder.load(db, self.es)
+        if len(user_ids) == 0:
+            return None
+
+        sparse_matrix, unique_users, unique_brands = build_user_item_matrix(user_ids, brand_ids, weights)
+        model = fit_als(sparse_matrix, self.interaction_builder)
+
+        return ALSModelState(
+            user_factors=model.user_factors,
+            item_factors=model.item_factors,
+            user_items=sparse_matrix,
+            user_ids=unique_users,
+            item_ids=unique_brands,
+            trained_at=datetime.utcnow(),
+            regularization=ALS_REGULARIZATION
         )
 
-        return {
-            self.index_to_item_id[int(idx)]: float(score)
-            for idx, score in zip(indices, values)
-            if int(idx) in self.index_to_item_id
-        }       
-    def get_vector_scores(self, db: Session, user_vec: list, top_k: int = 10):
-        embeddings = db.query(BrandEmbedding).all()
-        scores = []
-        for e in embeddings:
-            sim = np.dot(user_vec, e.embedding) / (np.linalg.norm(user_vec) * np.linalg.norm(e.embedding))
-            scores.append((e.brand_id, sim))
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return dict(scores[:top_k])
-
-    def get_hybrid_scores(
-        self, 
-        db: Session, 
-        user_id: int, 
-        user_vec: list, 
-        top_k: int = 10
-    ):
-        als_scores = self.get_als_scores(user_id, top_k * 2)
-        vec_scores = self.get_vector_scores(db, user_vec, top_k * 2)
+    async def aget_user_factor(self, state: ALSModelState, user_id: int, db: AsyncSession):
+        # 학습 이후의 상호작용을 고정된 item_factors에 fold-in 해서 사용자 팩터 계산
+        # 상호작용 조회는 aes/AsyncSession, fold-in 연산만 CPU 스레드에서 실행
+        user_code = state.user_code(user_id)
+        if user_code is not None and not ALS_FOLDIN_EXISTING:
+            return state.user_factors[user_code]
 
-        all_ids = set(als_scores.keys()) | set(vec_scores.keys())
-        hybrid_scores = {}
-        for bid in all_ids:
-            als = als_scores.get(bid, 0)
-            vec = vec_scores.get(bid, 0)
-            hybrid_scores[bid] = 0.5 * als + 0.5 * vec
+        found, factor = self.foldin_cache.get(state.version, user_id)
+        if found:
+            return factor
 
-        sorted_scores = sorted(hybrid_scores.items(), key=lambda x: x[1], reverse=True)
+        try:
+            brand_ids, weights = await afetch_user_interactions(
+                db, self.aes, user_id, since=state.trained_at, config=self.interaction_builder.config
+            )
+        except Exception as e:
+            logger.error(f"fold-in 상호작용 조회 실패 (user_id: {user_id}): {e}")
+            return state.user_factors[user_code] if user_code is not None else None
+
+        factor = await run_cpu(self._fold_in, state, user_code, brand_ids, weights)
+        self.foldin_cache.set(state.version, user_id, factor)
+        return factor
+
+    def _fold_in(self, state: ALSModelState, user_code: int | None, brand_ids: np.ndarray, weights: np.ndarray):
+        item_indices = state.item_indices(brand_ids)
+        valid = item_indices >= 0
+        item_indices, weights = item_indices[valid], weights[valid]
+        if user_code is not None:
+            # 기존 사용자는 학습 당시 가중치에 새 상호작용을 더해서 다시 계산
+            row = state.user_items[user_code]
+            item_indices = np.concatenate([row.indices, item_indices])
+            weights = np.concatenate([row.data, weights])
+
+        if len(item_indices) == 0:
+            return state.user_factors[user_code] if user_code is not None else None
+        unique_indices, inverse = np.unique(item_indices, return_inverse=True)
+        confidences = self.interaction_builder.to_confidence(np.bincount(inverse, weights=weights))
+        return fold_in_user(state, unique_indices, confidences)
+
+    async def aget_hybrid_scores(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        user_vec: list,
+        top_k: int = 10,
+        als_weight: float = HYBRID_ALS_WEIGHT,
+        vector_weight: float = HYBRID_VECTOR_WEIGHT,
+        normalization: str = HYBRID_NORMALIZATION
+    ):
+        # 두 모델의 전체 점수 벡터를 구한 뒤 후보 합집합을 배열 연산으로 정규화/가중합
+        # DB/ES 조회를 먼저 끝내고 행렬 연산만 CPU 스레드에 넘김
+        state = self.state
+        user_factor = await self.aget_user_factor(state, user_id, db) if state is not None else None
+        await self.brand_index.aensure_fresh(db)
+        return await run_cpu(
+            self.fuse_hybrid_scores, state, user_factor, user_vec, top_k, als_weight, vector_weight, normalization
+        )
 
-        return sorted_scores[:top_k]
\ No newline at end of file
+    def fuse_hybrid_scores(
+        self,
+        state: ALSModelState | None,
+        user_factor,
+        user_vec: list,
+        top_k: int,
+        als_weight: float,
+        vector_weight: float,
+        normalization: str
+    ):
+        # I/O 없이 메모리의 ALS 팩터와 브랜드 행렬로만 계산
+        als_scores, item_ids = None, np.empty(0, dtype=np.int64)
+        if state is not None and user_factor is not None:
+            als_scores, item_ids = (state.item_factors @ user_factor)[None, :], state.item_ids
+
+        brand_ids, vec_scores = self.brand_index.scores(user_vec)
+        if vec_scores is not None:
+            vec_scores = vec_scores[None, :]
+
+        results = fuse_scores(
+            als_scores, item_ids, vec_scores, brand_ids, top_k,
+            als_weight=als_weight, vector_weight=vector_weight, normalization=normalization
+        )
+        return results[0] if results else []
@@ -0,0 +1,37 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    # 데몬 스레드에서 fn을 interval초마다 실행, 예외는 로그만 남기고 다음 주기에 재시도
+    def __init__(self, name: str, interval: float, fn, run_immediately: bool = True):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.run_immediately = run_immediately
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"periodic-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run_once(self):
+        try:
+            self.fn()
+        except Exception as e:
+            logger.error(f"주기 작업 실패 (task: {self.name}): {e}")
+
+    def _run(self):
+        if self.run_immediately:
+            self._run_once()
+        while not self._stop.wait(self.interval):
+            self._run_once()
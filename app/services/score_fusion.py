@@ -0,0 +1,107 @@
+import numpy as np
+import os
+
+# ALS 점수(내적)와 임베딩 코사인 유사도는 스케일이 달라 후보군 안에서 정규화 후 가중합
+# minmax: 후보 내 최소/최대로 [0, 1], zscore: 후보 내 평균/표준편차, rank: 순위 기반 (1위 = 1)
+HYBRID_NORMALIZATION = os.getenv("HYBRID_NORMALIZATION", "minmax").lower()
+HYBRID_ALS_WEIGHT = float(os.getenv("HYBRID_ALS_WEIGHT", "0.5"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.5"))
+# 모델별로 top_k * 배수 만큼 후보를 뽑아 합집합을 양쪽 모델로 모두 채점
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "5"))
+
+NORMALIZATION_METHODS = ("minmax", "zscore", "rank")
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    # 행마다 점수 상위 k개 열 인덱스 (점수 내림차순)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def normalize_scores(scores: np.ndarray, method: str = HYBRID_NORMALIZATION) -> np.ndarray:
+    # 행 단위 정규화, nan은 후보가 아니거나 해당 모델 점수가 없는 칸
+    # 점수가 없는 후보는 그 행에서 가장 낮은 정규화 점수로 채움
+    valid = ~np.isnan(scores)
+    count = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "minmax":
+            low = np.where(valid, scores, np.inf).min(axis=1, keepdims=True)
+            high = np.where(valid, scores, -np.inf).max(axis=1, keepdims=True)
+            span = high - low
+            normalized = np.where(span > 0, (scores - low) / span, 1.0)
+            fill = np.zeros_like(low)
+        elif method == "zscore":
+            mean = np.where(valid, scores, 0.0).sum(axis=1, keepdims=True) / count
+            std = np.sqrt(np.where(valid, (scores - mean) ** 2, 0.0).sum(axis=1, keepdims=True) / count)
+            normalized = np.where(std > 0, (scores - mean) / std, 0.0)
+            fill = np.where(valid, normalized, np.inf).min(axis=1, keepdims=True)
+            fill[~np.isfinite(fill)] = 0.0
+        elif method == "rank":
+            order = np.argsort(-np.where(valid, scores, -np.inf), axis=1)
+            ranks = np.empty_like(order)
+            np.put_along_axis(ranks, order, np.arange(scores.shape[1])[None, :], axis=1)
+            normalized = 1.0 - ranks / count
+            fill = np.zeros((scores.shape[0], 1))
+        else:
+            raise ValueError(f"지원하지 않는 정규화 방식: {method}")
+
+    return np.where(valid, normalized, fill)
+
+
+def fuse_scores(
+    als_scores: np.ndarray | None,
+    item_ids: np.ndarray,
+    vec_scores: np.ndarray | None,
+    brand_ids: np.ndarray,
+    top_k: int = 10,
+    als_weight: float = HYBRID_ALS_WEIGHT,
+    vector_weight: float = HYBRID_VECTOR_WEIGHT,
+    normalization: str = HYBRID_NORMALIZATION,
+    candidate_multiplier: int = HYBRID_CANDIDATE_MULTIPLIER
+) -> list[list[tuple[int, float]]]:
+    # als_scores: (사용자 수, ALS 아이템 수), vec_scores: (사용자 수, 임베딩 브랜드 수)
+    # 두 모델의 브랜드 id를 하나의 축으로 맞춘 뒤 후보 합집합 안에서 정규화 -> 가중합 -> 상위 top_k
+    # 한 모델이 없으면 None (예: ALS 학습 이력이 없는 사용자)
+    sources = [
+        (scores, ids, weight)
+        for scores, ids, weight in ((als_scores, item_ids, als_weight), (vec_scores, brand_ids, vector_weight))
+        if scores is not None and len(ids) > 0
+    ]
+    if not sources:
+        return []
+
+    universe = np.unique(np.concatenate([ids for _, ids, _ in sources]))
+    rows = sources[0][0].shape[0]
+    candidate_count = top_k * candidate_multiplier
+
+    # 1. 모델별 상위 후보를 공통 축에 표시
+    columns = [np.searchsorted(universe, ids) for _, ids, _ in sources]
+    candidates = np.zeros((rows, len(universe)), dtype=bool)
+    for (scores, _, _), cols in zip(sources, columns):
+        top = top_k_indices(scores, candidate_count)
+        candidates[np.arange(rows)[:, None], cols[top]] = True
+
+    # 2. 후보 합집합을 양쪽 모델 점수로 모두 채운 뒤 정규화해서 가중합
+    fused = np.zeros((rows, len(universe)))
+    for (scores, _, weight), cols in zip(sources, columns):
+        aligned = np.full((rows, len(universe)), np.nan)
+        aligned[:, cols] = scores
+        aligned[~candidates] = np.nan
+        fused += weight * normalize_scores(aligned, normalization)
+    fused[~candidates] = -np.inf
+
+    # 3. argpartition으로 상위 top_k
+    top = top_k_indices(fused, top_k)
+    results = []
+    for row in range(rows):
+        results.append([
+            (int(universe[col]), float(fused[row, col]))
+            for col in top[row]
+            if np.isfinite(fused[row, col])
+        ])
+    return results
@@ -0,0 +1,240 @@
+import numpy as np
+import math
+import os
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import SessionLocal
+from app.services.scheduler import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+STORE_CATALOG_ENABLED = os.getenv("STORE_CATALOG_ENABLED", "1") == "1"
+# 변경 여부를 확인하는 주기(초), 변경이 있을 때만 다시 적재
+STORE_CATALOG_REFRESH_INTERVAL = int(os.getenv("STORE_CATALOG_REFRESH_INTERVAL", "300"))
+# 공간 격자 한 칸의 크기(km)
+STORE_CATALOG_CELL_KM = float(os.getenv("STORE_CATALOG_CELL_KM", "1.0"))
+
+EARTH_RADIUS_M = 6371008.8
+KM_PER_DEGREE = 111.32
+
+# 카탈로그 항목에 들어가는 모든 테이블(매장/브랜드/카테고리 이름/혜택)의 행 수와 최신 수정 시각
+CATALOG_VERSION_SQL = text("""
+    SELECT (SELECT COUNT(*) FROM store), (SELECT MAX(modified_at) FROM store),
+        (SELECT COUNT(*) FROM brand), (SELECT MAX(modified_at) FROM brand),
+        (SELECT COUNT(*) FROM category), (SELECT MAX(modified_at) FROM category),
+        (SELECT COUNT(*) FROM benefit), (SELECT MAX(modified_at) FROM benefit)
+""")
+
+CATALOG_STORES_SQL = text("""
+    SELECT s.id, s.brand_id, s.name, ST_Y(s.location::geometry) AS lat, ST_X(s.location::geometry) AS lng
+    FROM store s
+    WHERE s.brand_id IS NOT NULL AND s.location IS NOT NULL
+    ORDER BY s.id
+""")
+
+# minRank: 혜택 중 rank가 NONE이 아닌 첫 번째 값 (없으면 NONE)
+MIN_RANK_SQL = """
+    COALESCE((
+        SELECT bn.rank FROM benefit bn
+        WHERE bn.brand_id = b.id AND bn.rank <> 'NONE'
+        ORDER BY bn.id
+        LIMIT 1
+    ), 'NONE')
+"""
+
+CATALOG_BRANDS_SQL = text(f"""
+    SELECT b.id, b.description, b.rank_type, b.image_url, c.name AS category,
+        {MIN_RANK_SQL} AS min_rank
+    FROM brand b
+    LEFT JOIN category c ON b.category_id = c.id
+""")
+
+# 카탈로그가 없을 때: 추천 브랜드마다 반경 내 가장 가까운 매장 1개만 KNN(<->)으로 조회
+# 응답에 쓰는 컬럼과 minRank만 가져오고, 브랜드 순서는 WITH ORDINALITY로 유지
+NEAREST_STORE_PER_BRAND_SQL = text(f"""
+    SELECT ns.id AS store_id, b.id AS brand_id, ns.name,
+        ST_Y(ns.location::geometry) AS lat, ST_X(ns.location::geometry) AS lng,
+        c.name AS category, b.description, b.rank_type, b.image_url,
+        {MIN_RANK_SQL} AS min_rank
+    FROM unnest(CAST(:brand_ids AS bigint[])) WITH ORDINALITY AS rb(brand_id, ord)
+    JOIN brand b ON b.id = rb.brand_id
+    LEFT JOIN category c ON c.id = b.category_id
+    CROSS JOIN LATERAL (
+        SELECT s.id, s.name, s.location
+        FROM store s
+        WHERE s.brand_id = rb.brand_id
+            AND ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+        ORDER BY s.location <-> ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography
+        LIMIT 1
+    ) ns
+    ORDER BY rb.ord
+""")
+
+
+def haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class _CatalogData:
+    # 한 번 적재한 매장/브랜드 스냅샷, 통째로 교체해서 읽는 쪽이 항상 일관된 데이터를 보도록 함
+    def __init__(self, rows: list, brands: list, cell_km: float):
+        self.store_ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        self.brand_ids = np.fromiter((row.brand_id for row in rows), dtype=np.int64, count=len(rows))
+        self.lats = np.fromiter((row.lat for row in rows), dtype=np.float64, count=len(rows))
+        self.lngs = np.fromiter((row.lng for row in rows), dtype=np.float64, count=len(rows))
+        self.names = [row.name for row in rows]
+        self.brands = {
+            brand.id: {
+                "category": brand.category,
+                "description": brand.description,
+                "isVIPcock": brand.rank_type in ("VIP", "VIP_NORMAL"),
+                "minRank": brand.min_rank,
+                "imgUrl": brand.image_url
+            }
+            for brand in brands
+        }
+
+        # 격자 크기는 위도 방향 cell_km, 경도 방향은 매장 평균 위도 기준으로 같은 거리가 되도록 설정
+        ref_lat = float(self.lats.mean()) if len(rows) else 37.5
+        self.lat_cell = cell_km / KM_PER_DEGREE
+        self.lng_cell = cell_km / (KM_PER_DEGREE * math.cos(math.radians(ref_lat)))
+
+        # (brand_id, 격자 y, 격자 x) -> 매장 행 번호 배열
+        cell_y = np.floor(self.lats / self.lat_cell).astype(np.int64)
+        cell_x = np.floor(self.lngs / self.lng_cell).astype(np.int64)
+        order = np.lexsort((cell_x, cell_y, self.brand_ids))
+        keys = np.stack([self.brand_ids, cell_y, cell_x], axis=1)[order]
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate([[0], boundaries]) if len(order) else np.empty(0, dtype=np.int64)
+        ends = np.concatenate([boundaries, [len(order)]]) if len(order) else np.empty(0, dtype=np.int64)
+        self.cells = {
+            tuple(int(v) for v in keys[start]): order[start:end]
+            for start, end in zip(starts, ends)
+        }
+
+    def cell_range(self, lat: float, lng: float, radius_m: float) -> tuple[range, range]:
+        radius_km = radius_m / 1000
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        ys = range(math.floor((lat - dlat) / self.lat_cell), math.floor((lat + dlat) / self.lat_cell) + 1)
+        xs = range(math.floor((lng - dlng) / self.lng_cell), math.floor((lng + dlng) / self.lng_cell) + 1)
+        return ys, xs
+
+
+class StoreCatalog:
+    # 매장 id/brand_id/좌표 배열과 브랜드 메타데이터를 메모리에 유지
+    # 브랜드별 가장 가까운 반경 내 매장 조회를 DB 왕복 없이 처리
+    def __init__(self, cell_km: float = STORE_CATALOG_CELL_KM):
+        self.cell_km = cell_km
+        self._data = None
+        self._version = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    def ensure_fresh(self, db: Session):
+        version = tuple(db.execute(CATALOG_VERSION_SQL).one())
+        if self._data is not None and version == self._version:
+            return
+        self._load(db)
+        self._version = version
+
+    def _load(self, db: Session):
+        rows = db.execute(CATALOG_STORES_SQL).all()
+        brands = db.execute(CATALOG_BRANDS_SQL).all()
+        self._data = _CatalogData(rows, brands, self.cell_km)
+        logger.info(f"매장 카탈로그 적재 완료: 매장 {len(rows)}개, 브랜드 {len(brands)}개, 격자 {len(self._data.cells)}칸")
+
+    def refresh(self):
+        with SessionLocal() as db:
+            self.ensure_fresh(db)
+
+    def nearest_stores(self, brand_ids: list, lat: float, lng: float, radius_m: float) -> dict | None:
+        # brand_id -> 반경 내 가장 가까운 매장 행 번호, 카탈로그가 없으면 None
+        return self._nearest(self._data, brand_ids, lat, lng, radius_m)
+
+    @staticmethod
+    def _nearest(data: _CatalogData | None, brand_ids: list, lat: float, lng: float, radius_m: float) -> dict | None:
+        if data is None:
+            return None
+
+        ys, xs = data.cell_range(lat, lng, radius_m)
+        nearest = {}
+        for brand_id in brand_ids:
+            cells = [data.cells.get((brand_id, y, x)) for y in ys for x in xs]
+            cells = [cell for cell in cells if cell is not None]
+            if not cells:
+                continue
+            rows = np.concatenate(cells)
+            distances = haversine_m(lat, lng, data.lats[rows], data.lngs[rows])
+            best = int(np.argmin(distances))
+            if distances[best] <= radius_m:
+                nearest[brand_id] = int(rows[best])
+        return nearest
+
+    def recommendation_items(self, results: list, lat: float, lng: float, radius_m: float) -> list | None:
+        # 추천 브랜드 순서대로 가장 가까운 매장을 붙여 응답 항목 구성
+        data = self._data
+        nearest = self._nearest(data, [brand_id for brand_id, _ in results], lat, lng, radius_m)
+        if nearest is None:
+            return None
+
+        items = []
+        for brand_id, _ in results:
+            row = nearest.get(brand_id)
+            brand = data.brands.get(brand_id)
+            if row is None or brand is None:
+                continue
+            items.append({
+                "storeId": int(data.store_ids[row]),
+                "brandId": brand_id,
+                "name": data.names[row],
+                "latitude": float(data.lats[row]),
+                "longitude": float(data.lngs[row]),
+                **brand
+            })
+        return items
+
+
+def _nearest_store_params(results: list, lat: float, lng: float, radius_m: float) -> dict:
+    return {"brand_ids": [int(brand_id) for brand_id, _ in results], "lat": lat, "lng": lng, "radius": radius_m}
+
+
+def _nearest_store_item(row) -> dict:
+    return {
+        "storeId": row.store_id,
+        "brandId": row.brand_id,
+        "name": row.name,
+        "latitude": row.lat,
+        "longitude": row.lng,
+        "category": row.category,
+        "description": row.description,
+        "isVIPcock": row.rank_type in ("VIP", "VIP_NORMAL"),
+        "minRank": row.min_rank,
+        "imgUrl": row.image_url
+    }
+
+
+def fetch_recommendation_items(db: Session, results: list, lat: float, lng: float, radius_m: float) -> list:
+    rows = db.execute(NEAREST_STORE_PER_BRAND_SQL, _nearest_store_params(results, lat, lng, radius_m)).all()
+    return [_nearest_store_item(row) for row in rows]
+
+
+async def afetch_recommendation_items(db: AsyncSession, results: list, lat: float, lng: float, radius_m: float) -> list:
+    rows = (await db.execute(NEAREST_STORE_PER_BRAND_SQL, _nearest_store_params(results, lat, lng, radius_m))).all()
+    return [_nearest_store_item(row) for row in rows]
+
+
+store_catalog = StoreCatalog()
+store_catalog_refresher = PeriodicTask("store-catalog", STORE_CATALOG_REFRESH_INTERVAL, store_catalog.refresh)
+
+
+def start_store_catalog_refresh():
+    if STORE_CATALOG_ENABLED:
+        store_catalog_refresher.start()
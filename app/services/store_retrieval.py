@@ -0,0 +1,193 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import engine
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 반경 내 매장 수가 이 값 이하이면 공간 필터 후 전체 정확 계산, 초과하면 ANN 후보 추출
+STORE_EXACT_MAX_CANDIDATES = int(os.getenv("STORE_EXACT_MAX_CANDIDATES", "2000"))
+# ANN 1단계에서 가져올 후보 수 (2단계에서 인기도와 섞어 재정렬)
+STORE_ANN_CANDIDATES = int(os.getenv("STORE_ANN_CANDIDATES", "200"))
+STORE_HNSW_EF_SEARCH = int(os.getenv("STORE_HNSW_EF_SEARCH", "200"))
+# pgvector 0.8+ 의 필터 결합 반복 스캔: relaxed_order / strict_order / off
+# 이전 버전에는 hnsw.iterative_scan 설정이 없어 SET이 실패하므로 기본값은 빈 값(설정하지 않음)
+STORE_HNSW_ITERATIVE_SCAN = os.getenv("STORE_HNSW_ITERATIVE_SCAN", "")
+STORE_ANN_AUTO_CREATE_INDEX = os.getenv("STORE_ANN_AUTO_CREATE_INDEX", "1") == "1"
+
+SIMILARITY_WEIGHT = 0.7
+POPULARITY_WEIGHT = 0.3
+
+CREATE_STORE_EMBEDDING_HNSW_INDEX_SQL = text("""
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS store_embedding_embedding_hnsw_idx
+    ON store_embedding USING hnsw (embedding vector_cosine_ops)
+""")
+
+# 반경 내 매장 수 추정 (상한까지만 세고 멈춤)
+COUNT_IN_RADIUS_SQL = text("""
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM store s
+        WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+        LIMIT :cap
+    ) t
+""")
+
+# 공간 필터 후 전체 후보에 대해 코사인 유사도 정확 계산
+EXACT_SQL = text("""
+    SELECT s.id, s.name, s.address,
+        1 - (se.embedding <=> CAST(:user_vec AS vector)) AS similarity,
+        COALESCE(sp.click_count, 0) AS click_score,
+        COALESCE(sp.visit_count, 0) AS visit_score,
+        COALESCE(sp.normalized_click_score, 0) AS normalized_click_score
+    FROM store_embedding se
+    JOIN store s ON se.store_id = s.id
+    LEFT JOIN store_popularity sp ON sp.store_id = s.id
+    WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+    ORDER BY :similarity_weight * (1 - (se.embedding <=> CAST(:user_vec AS vector)))
+        + :popularity_weight * COALESCE(sp.normalized_click_score, 0) DESC
+    LIMIT :limit
+""")
+
+# 1단계: HNSW 코사인 인덱스로 반경 내 상위 후보 추출, 2단계: 인기도와 섞어 재정렬
+ANN_SQL = text("""
+    WITH candidates AS MATERIALIZED (
+        SELECT se.store_id, se.embedding <=> CAST(:user_vec AS vector) AS distance
+        FROM store_embedding se
+        JOIN store s ON se.store_id = s.id
+        WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+        ORDER BY se.embedding <=> CAST(:user_vec AS vector)
+        LIMIT :candidates
+    )
+    SELECT s.id, s.name, s.address,
+        1 - c.distance AS similarity,
+        COALESCE(sp.click_count, 0) AS click_score,
+        COALESCE(sp.visit_count, 0) AS visit_score,
+        COALESCE(sp.normalized_click_score, 0) AS normalized_click_score
+    FROM candidates c
+    JOIN store s ON s.id = c.store_id
+    LEFT JOIN store_popularity sp ON sp.store_id = s.id
+    ORDER BY :similarity_weight * (1 - c.distance)
+        + :popularity_weight * COALESCE(sp.normalized_click_score, 0) DESC
+    LIMIT :limit
+""")
+
+
+def ensure_store_ann_index():
+    # 인덱스 생성 중에도 쓰기가 막히지 않도록 CONCURRENTLY로, 트랜잭션 밖(autocommit)에서 실행
+    # 서버 기동을 막지 않도록 백그라운드 스레드에서 수행
+    if not STORE_ANN_AUTO_CREATE_INDEX:
+        return
+    threading.Thread(target=_create_store_ann_index, name="store-ann-index", daemon=True).start()
+
+
+def _create_store_ann_index():
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(CREATE_STORE_EMBEDDING_HNSW_INDEX_SQL)
+    except Exception as e:
+        logger.error(f"store_embedding HNSW 인덱스 생성 실패: {e}")
+
+
+def _count_params(lat: float, lng: float, radius_m: float) -> dict:
+    return {
+        "lat": lat,
+        "lng": lng,
+        "radius": radius_m,
+        "cap": STORE_EXACT_MAX_CANDIDATES + 1
+    }
+
+
+def choose_strategy(db: Session, lat: float, lng: float, radius_m: float) -> str:
+    count = db.execute(COUNT_IN_RADIUS_SQL, _count_params(lat, lng, radius_m)).scalar()
+    return "exact" if count <= STORE_EXACT_MAX_CANDIDATES else "ann"
+
+
+def _ann_search_settings(candidates: int) -> list:
+    # SET LOCAL 은 현재 트랜잭션에만 적용됨
+    # 반복 스캔이 없으면 HNSW는 ef_search개까지만 반환하므로 최소 후보 수 이상으로 설정 (pgvector 상한 1000)
+    ef_search = min(max(STORE_HNSW_EF_SEARCH, candidates), 1000)
+    statements = [text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")]
+    if STORE_HNSW_ITERATIVE_SCAN in ("relaxed_order", "strict_order", "off"):
+        statements.append(text(f"SET LOCAL hnsw.iterative_scan = {STORE_HNSW_ITERATIVE_SCAN}"))
+    return statements
+
+
+def _search_query(user_vec: list, lat: float, lng: float, radius_m: float, strategy: str, limit: int):
+    params = {
+        "user_vec": user_vec,
+        "lat": lat,
+        "lng": lng,
+        "radius": radius_m,
+        "limit": limit,
+        "similarity_weight": SIMILARITY_WEIGHT,
+        "popularity_weight": POPULARITY_WEIGHT
+    }
+    if strategy == "ann":
+        params["candidates"] = max(STORE_ANN_CANDIDATES, limit)
+        return ANN_SQL, params
+    return EXACT_SQL, params
+
+
+def _needs_exact_fallback(strategy: str, rows: list, limit: int) -> bool:
+    # HNSW 후보를 뽑은 뒤 반경 필터를 적용하므로 밀집 지역에서는 후보가 limit보다 적게 남을 수 있음
+    # 이 경우 정확 계산으로 다시 조회
+    if strategy == "ann" and len(rows) < limit:
+        logger.info(f"ANN 후보 부족({len(rows)}/{limit}), 정확 계산으로 재조회")
+        return True
+    return False
+
+
+def search_nearby_stores(
+    db: Session,
+    user_vec: list,
+    lat: float,
+    lng: float,
+    radius_m: float,
+    strategy: str = "auto",
+    limit: int = 10
+) -> tuple[str, list]:
+    # 반환하는 전략은 실제로 결과를 만든 쿼리 기준 (ANN 후보 부족으로 재조회했으면 exact)
+    if strategy == "auto":
+        strategy = choose_strategy(db, lat, lng, radius_m)
+
+    sql, params = _search_query(user_vec, lat, lng, radius_m, strategy, limit)
+    if strategy == "ann":
+        for statement in _ann_search_settings(params["candidates"]):
+            db.execute(statement)
+    rows = db.execute(sql, params).mappings().all()
+    if _needs_exact_fallback(strategy, rows, limit):
+        strategy = "exact"
+        rows = db.execute(*_search_query(user_vec, lat, lng, radius_m, strategy, limit)).mappings().all()
+
+    logger.debug(f"매장 검색 전략: {strategy}, 결과 {len(rows)}건")
+    return strategy, [dict(row) for row in rows]
+
+
+async def asearch_nearby_stores(
+    db: AsyncSession,
+    user_vec: list,
+    lat: float,
+    lng: float,
+    radius_m: float,
+    strategy: str = "auto",
+    limit: int = 10
+) -> tuple[str, list]:
+    # search_nearby_stores의 비동기 버전 (같은 SQL/파라미터 사용)
+    if strategy == "auto":
+        count = (await db.execute(COUNT_IN_RADIUS_SQL, _count_params(lat, lng, radius_m))).scalar()
+        strategy = "exact" if count <= STORE_EXACT_MAX_CANDIDATES else "ann"
+
+    sql, params = _search_query(user_vec, lat, lng, radius_m, strategy, limit)
+    if strategy == "ann":
+        for statement in _ann_search_settings(params["candidates"]):
+            await db.execute(statement)
+    rows = (await db.execute(sql, params)).mappings().all()
+    if _needs_exact_fallback(strategy, rows, limit):
+        strategy = "exact"
+        rows = (await db.execute(*_search_query(user_vec, lat, lng, radius_m, strategy, limit))).mappings().all()
+
+    logger.debug(f"매장 검색 전략: {strategy}, 결과 {len(rows)}건")
+    return strategy, [dict(row) for row in rows]
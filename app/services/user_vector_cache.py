@@ -0,0 +1,91 @@
+import numpy as np
+import hashlib
+import os
+import logging
+from app.database.redis_client import r_bin, ar_bin
+from app.services.cpu_executor import run_cpu
+from app.services.embedding_service import encode_text
+
+logger = logging.getLogger(__name__)
+
+USER_VECTOR_TTL = int(os.getenv("USER_VECTOR_TTL", "86400"))
+
+# 저장 형식: 버전 1바이트 + 프로필 해시 8바이트 + float32 벡터 바이트
+USER_VECTOR_FORMAT = b"\x01"
+PROFILE_HASH_BYTES = 8
+
+
+def user_vector_key(user_id: int) -> str:
+    return f"user_vector:{user_id}"
+
+
+def profile_hash(profile_text: str) -> bytes:
+    return hashlib.sha1(profile_text.encode("utf-8")).digest()[:PROFILE_HASH_BYTES]
+
+
+def _vector(cached: bytes | None) -> np.ndarray | None:
+    # 버전이 다른 값(이전 base64 형식 등)은 없는 것으로 처리
+    if not cached or cached[:1] != USER_VECTOR_FORMAT:
+        return None
+    return np.frombuffer(cached, dtype=np.float32, offset=1 + PROFILE_HASH_BYTES)
+
+
+def _decode(cached: bytes | None, profile_text: str) -> np.ndarray | None:
+    # 프로필 입력이 바뀌면 해시 불일치로 미스 처리
+    if not cached or cached[1:1 + PROFILE_HASH_BYTES] != profile_hash(profile_text):
+        return None
+    return _vector(cached)
+
+
+def _encode(profile_text: str, user_vec: np.ndarray) -> bytes:
+    return USER_VECTOR_FORMAT + profile_hash(profile_text) + np.asarray(user_vec, dtype=np.float32).tobytes()
+
+
+def get_user_vectors(user_ids: list, profile_texts: dict | None = None) -> dict:
+    # 배치 작업용: MGET 한 번으로 여러 사용자 벡터를 조회
+    # profile_texts(user_id -> 프로필 텍스트)가 없으면 해시 검사 없이 마지막으로 인코딩된 벡터를 사용
+    # (이 경우 활동 변경 시 무효화 API가 호출되어야 최신 프로필 기준이 되므로, 배치 작업은 profile_texts를 넘김)
+    if not user_ids:
+        return {}
+    vectors = {}
+    for user_id, cached in zip(user_ids, r_bin.mget([user_vector_key(user_id) for user_id in user_ids])):
+        if profile_texts is not None:
+            user_vec = _decode(cached, profile_texts[user_id])
+        else:
+            user_vec = _vector(cached)
+        if user_vec is not None:
+            vectors[user_id] = user_vec
+    return vectors
+
+
+def set_user_vectors(entries: list):
+    # entries: [(user_id, profile_text, user_vec)]
+    pipe = r_bin.pipeline(transaction=False)
+    for user_id, profile_text, user_vec in entries:
+        pipe.setex(user_vector_key(user_id), USER_VECTOR_TTL, _encode(profile_text, user_vec))
+    pipe.execute()
+
+
+async def aget_or_encode_user_vector(user_id: int, profile_text: str, cache: bool = True) -> np.ndarray:
+    # 비동기 API용: Redis는 비동기 클라이언트로, 인코딩은 CPU 전용 스레드 풀에서 실행
+    # cache=False이면 인코딩 결과를 저장하지 않음 (일부 소스가 빠진 프로필 등)
+    try:
+        cached = _decode(await ar_bin.get(user_vector_key(user_id)), profile_text)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logger.error(f"사용자 벡터 캐시 조회 실패 (user_id: {user_id}): {e}")
+
+    user_vec = await run_cpu(encode_text, profile_text)
+    if not cache:
+        return user_vec
+
+    try:
+        await ar_bin.setex(user_vector_key(user_id), USER_VECTOR_TTL, _encode(profile_text, user_vec))
+    except Exception as e:
+        logger.error(f"사용자 벡터 캐시 저장 실패 (user_id: {user_id}): {e}")
+    return user_vec
+
+
+async def ainvalidate_user_vector(user_id: int):
+    await ar_bin.delete(user_vector_key(user_id))
@@ -0,0 +1,94 @@
+# 사용자 데이터 수집 비교: 사용자별 collect_user_data 반복 vs 일괄 collect_users_data
+#
+#   python -m scripts.bench_collect_user_data --users 1000 10000 --per-user-sample 500
+#
+# 활동 이력이 있는 사용자를 임의로 뽑아 두 방식의 소요 시간과 DB/ES 왕복 수를 측정
+# 사용자별 방식은 --per-user-sample 명만 실제로 실행하고 나머지는 1인당 평균으로 환산
+# 같은 사용자에 대한 두 방식의 프로필 구성 항목 일치율도 함께 출력
+import argparse
+import logging
+import time
+from collections import Counter
+from sqlalchemy import event, text
+from app.database.connection import SessionLocal, engine
+from app.database.es import es
+from app.services.collect_user_data import collect_user_data, collect_users_data
+
+SAMPLE_USERS_SQL = text("""
+    SELECT user_id FROM (
+        SELECT user_id FROM user_category
+        UNION SELECT user_id FROM usage_history
+        UNION SELECT user_id FROM bookmark
+    ) u
+    WHERE user_id IS NOT NULL
+    ORDER BY random()
+    LIMIT :users
+""")
+
+
+class RoundTripCounter(logging.Handler):
+    # elastic_transport는 요청마다 INFO 로그를 한 줄 남기므로 로그 수로 ES 왕복을 셈
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.db = 0
+        self.es = 0
+
+    def emit(self, record):
+        if record.levelno == logging.INFO:
+            self.es += 1
+
+    def on_db_execute(self, *args):
+        self.db += 1
+
+    def reset(self):
+        self.db = self.es = 0
+
+
+def measure(counter: RoundTripCounter, fn) -> tuple[object, float, int, int]:
+    counter.reset()
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started, counter.db, counter.es
+
+
+def match_rate(single: dict, bulk: dict) -> float:
+    # SQL 결과는 정렬 기준이 없으므로 항목 구성(중복 포함)으로 비교
+    matched = sum(
+        all(Counter(a) == Counter(b) for a, b in zip(single[user_id], bulk[user_id]))
+        for user_id in single
+    )
+    return matched / len(single) if single else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--per-user-sample", type=int, default=500)
+    args = parser.parse_args()
+
+    counter = RoundTripCounter()
+    transport_logger = logging.getLogger("elastic_transport.transport")
+    transport_logger.setLevel(logging.INFO)
+    transport_logger.addHandler(counter)
+    transport_logger.propagate = False
+    event.listen(engine, "before_cursor_execute", counter.on_db_execute)
+
+    with SessionLocal() as db:
+        for size in args.users:
+            user_ids = [int(user_id) for user_id in db.execute(SAMPLE_USERS_SQL, {"users": size}).scalars()]
+            sample = user_ids[:args.per_user_sample]
+
+            single, single_s, single_db, single_es = measure(
+                counter, lambda: {user_id: collect_user_data(user_id, db, es) for user_id in sample}
+            )
+            bulk, bulk_s, bulk_db, bulk_es = measure(counter, lambda: collect_users_data(user_ids, db, es))
+
+            scale = len(user_ids) / max(len(sample), 1)
+            print(f"users: {len(user_ids)} (사용자별 방식 실측 {len(sample)}명, x{scale:.1f} 환산)")
+            print(f"  사용자별: {single_s * scale:8.2f} s, DB 왕복 {single_db * scale:8.0f}, ES 왕복 {single_es * scale:8.0f}")
+            print(f"  일괄    : {bulk_s:8.2f} s, DB 왕복 {bulk_db:8d}, ES 왕복 {bulk_es:8d}")
+            print(f"  프로필 항목 일치율 (실측 사용자 기준): {match_rate(single, bulk):.4f}")
+
+
+if __name__ == "__main__":
+    main()
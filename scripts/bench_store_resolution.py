@@ -0,0 +1,156 @@
+# /api/recommend/hybrid 매장 조회 비교: 기존 ORM(joinedload) vs 브랜드당 1건 LATERAL KNN SQL vs 메모리 카탈로그
+#
+#   python -m scripts.bench_store_resolution --samples 50 --brands 10 --radius-km 2
+#
+# 임의 매장 위치를 중심으로, 반경 내 매장이 있는 브랜드 위주로 추천 브랜드 목록을 구성
+# 각 방식이 고른 매장 id가 ORM 결과와 일치하는 비율도 함께 출력
+import argparse
+import statistics
+import time
+from collections import defaultdict
+from sqlalchemy import func, text
+from sqlalchemy.orm import joinedload
+from geoalchemy2.shape import to_shape
+from app.database.connection import SessionLocal
+from app.models import Store, Brand
+from app.services.store_catalog import StoreCatalog, fetch_recommendation_items
+
+SAMPLE_SQL = text("""
+    SELECT ST_Y(s.location::geometry) AS lat, ST_X(s.location::geometry) AS lng
+    FROM store s
+    WHERE s.location IS NOT NULL AND s.brand_id IS NOT NULL
+    ORDER BY random()
+    LIMIT :samples
+""")
+
+BRANDS_NEAR_SQL = text("""
+    SELECT s.brand_id, COUNT(*) AS store_count
+    FROM store s
+    WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+        AND s.brand_id IS NOT NULL
+    GROUP BY s.brand_id
+    ORDER BY COUNT(*) DESC
+    LIMIT :brands
+""")
+
+
+def get_min_rank(benefits: list) -> str:
+    for b in benefits:
+        if b.rank != "NONE":
+            return b.rank
+    return "NONE"
+
+
+def orm_items(db, results: list, lat: float, lng: float, radius_m: float) -> tuple[list, int]:
+    # 변경 전 /api/recommend/hybrid 4~5단계 (반경 내 전체 매장을 ORM 객체로 읽은 뒤 브랜드별 첫 매장만 사용)
+    stores = db.query(Store).options(
+        joinedload(Store.brand).joinedload(Brand.category),
+        joinedload(Store.brand).joinedload(Brand.benefits)
+    ).filter(
+        Store.brand_id.in_([brand_id for brand_id, _ in results]),
+        func.ST_DWithin(Store.location, func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), radius_m)
+    ).order_by(
+        func.ST_Distance(Store.location, func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326))
+    ).all()
+
+    brand_store_map = defaultdict(list)
+    for store in stores:
+        brand_store_map[store.brand_id].append(store)
+
+    items = []
+    for brand_id, _ in results:
+        if brand_id not in brand_store_map:
+            continue
+        store = brand_store_map[brand_id][0]
+        brand = store.brand
+        point = to_shape(store.location)
+        items.append({
+            "storeId": store.id,
+            "brandId": brand.id,
+            "name": store.name,
+            "latitude": point.y,
+            "longitude": point.x,
+            "category": brand.category.name if brand.category else None,
+            "description": brand.description,
+            "isVIPcock": brand.rank_type in ("VIP", "VIP_NORMAL"),
+            "minRank": get_min_rank(brand.benefits),
+            "imgUrl": brand.image_url
+        })
+    return items, len(stores)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def summarize(name: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:>8}: p50 {statistics.median(latencies):8.2f} ms, p95 {p95:8.2f} ms")
+
+
+def store_ids(items: list) -> dict:
+    return {item["brandId"]: item["storeId"] for item in items}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--brands", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    args = parser.parse_args()
+    radius_m = args.radius_km * 1000
+
+    latencies = {"orm": [], "lateral": [], "catalog": []}
+    matches = {"lateral": [], "catalog": []}
+    orm_rows = []
+
+    catalog = StoreCatalog()
+    with SessionLocal() as db:
+        _, load_ms = timed(lambda: catalog.ensure_fresh(db))
+        print(f"카탈로그 적재: {load_ms:.0f} ms")
+
+        samples = db.execute(SAMPLE_SQL, {"samples": args.samples}).mappings().all()
+        for sample in samples:
+            lat, lng = sample["lat"], sample["lng"]
+            brands = db.execute(BRANDS_NEAR_SQL, {
+                "lat": lat, "lng": lng, "radius": radius_m, "brands": args.brands
+            }).scalars().all()
+            results = [[int(brand_id), 1.0] for brand_id in brands]
+
+            (orm, rows), elapsed = timed(lambda: orm_items(db, results, lat, lng, radius_m))
+            latencies["orm"].append(elapsed)
+            orm_rows.append(rows)
+            # 다음 측정에 ORM identity map이 영향을 주지 않도록 비움
+            db.expunge_all()
+
+            lateral, elapsed = timed(lambda: fetch_recommendation_items(db, results, lat, lng, radius_m))
+            latencies["lateral"].append(elapsed)
+
+            in_memory, elapsed = timed(lambda: catalog.recommendation_items(results, lat, lng, radius_m))
+            latencies["catalog"].append(elapsed)
+
+            # 거리가 같은 매장이 여럿이면 다른 매장을 고를 수 있으므로 브랜드 단위 일치율로 확인
+            expected = store_ids(orm)
+            for name, items in (("lateral", lateral), ("catalog", in_memory)):
+                if expected:
+                    got = store_ids(items)
+                    matches[name].append(
+                        sum(got.get(brand_id) == store_id for brand_id, store_id in expected.items()) / len(expected)
+                    )
+
+    print(f"samples: {len(samples)}, brands: {args.brands}, radius: {args.radius_km} km")
+    for name, values in latencies.items():
+        if values:
+            summarize(name, values)
+    if orm_rows:
+        print(f"ORM 경로 매장 행 수: 평균 {statistics.mean(orm_rows):.1f}, 최대 {max(orm_rows)} (LATERAL은 브랜드당 최대 1행)")
+    for name, values in matches.items():
+        if values:
+            print(f"{name} 매장 일치율 (ORM 기준): {statistics.mean(values):.4f}")
+
+
+if __name__ == "__main__":
+    main()
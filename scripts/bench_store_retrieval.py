@@ -0,0 +1,128 @@
+# /api/recommend 매장 검색 전략 비교: 기존 L2 정확 쿼리 vs 코사인 정확 계산(exact) vs HNSW 2단계(ann)
+#
+#   python -m scripts.bench_store_retrieval --samples 50 --radius-km 2
+#
+# 임의 매장의 위치를 검색 중심으로, 임의 매장 임베딩을 사용자 벡터로 사용
+# recall@k 는 코사인 정확 계산 결과를 정답으로 계산
+import argparse
+import statistics
+import time
+from sqlalchemy import text
+from app.database.connection import SessionLocal
+from app.services.store_retrieval import search_nearby_stores, choose_strategy
+
+# 변경 전 /api/recommend 쿼리
+LEGACY_SQL = text("""
+    WITH click_counts AS (
+    SELECT store_id, COUNT(*) AS click_count
+    FROM store_click_log
+    GROUP BY store_id
+    ),
+    click_stats AS (
+        SELECT MAX(click_count) AS max_clicks,
+            MIN(click_count) AS min_clicks
+        FROM click_counts
+    )
+    SELECT s.id, s.name, s.address,
+        1 - (embedding <-> CAST(:user_vec AS vector)) AS similarity,
+        COALESCE(cc.click_count, 0) AS click_score,
+        (SELECT COUNT(*) FROM usage_history WHERE store_id = s.id) AS visit_score,
+        CASE
+            WHEN cs.max_clicks > cs.min_clicks THEN
+                (COALESCE(cc.click_count, 0) - cs.min_clicks)::float / NULLIF(cs.max_clicks - cs.min_clicks, 0)
+            ELSE 0
+        END AS normalized_click_score
+    FROM store_embedding se
+    JOIN store s ON se.store_id = s.id
+    LEFT JOIN click_counts cc ON cc.store_id = s.id
+    CROSS JOIN click_stats cs
+    WHERE ST_DWithin(s.location, ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography, :radius)
+    ORDER BY 0.7 * (1 - (embedding <-> CAST(:user_vec AS vector))) + 0.3 * (
+        CASE
+            WHEN cs.max_clicks > cs.min_clicks THEN
+                (COALESCE(cc.click_count, 0) - cs.min_clicks)::float / NULLIF(cs.max_clicks - cs.min_clicks, 0)
+            ELSE 0
+        END
+    ) DESC
+    LIMIT :limit
+""")
+
+SAMPLE_SQL = text("""
+    SELECT ST_Y(s.location::geometry) AS lat, ST_X(s.location::geometry) AS lng, se.embedding
+    FROM store_embedding se
+    JOIN store s ON se.store_id = s.id
+    WHERE s.location IS NOT NULL
+    ORDER BY random()
+    LIMIT :samples
+""")
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def summarize(name: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:>8}: p50 {statistics.median(latencies):8.2f} ms, p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    radius_m = args.radius_km * 1000
+
+    latencies = {"legacy": [], "exact": [], "ann": []}
+    recalls = []
+    auto_choices = {"exact": 0, "ann": 0}
+    ann_fallbacks = 0
+
+    with SessionLocal() as db:
+        samples = db.execute(SAMPLE_SQL, {"samples": args.samples}).mappings().all()
+        for sample in samples:
+            user_vec = [float(x) for x in sample["embedding"]]
+            lat, lng = sample["lat"], sample["lng"]
+
+            _, elapsed = timed(lambda: db.execute(LEGACY_SQL, {
+                "user_vec": user_vec, "lat": lat, "lng": lng, "radius": radius_m, "limit": args.k
+            }).mappings().all())
+            latencies["legacy"].append(elapsed)
+
+            (_, exact), elapsed = timed(
+                lambda: search_nearby_stores(db, user_vec, lat, lng, radius_m, "exact", args.k)
+            )
+            latencies["exact"].append(elapsed)
+
+            # SET LOCAL 설정이 다음 측정에 남지 않도록 트랜잭션 단위로 분리
+            db.rollback()
+            (ann_strategy, ann), elapsed = timed(
+                lambda: search_nearby_stores(db, user_vec, lat, lng, radius_m, "ann", args.k)
+            )
+            latencies["ann"].append(elapsed)
+            # 반경 필터 후 ANN 후보가 k개보다 적으면 exact로 재조회됨
+            ann_fallbacks += ann_strategy != "ann"
+            db.rollback()
+
+            auto_choices[choose_strategy(db, lat, lng, radius_m)] += 1
+
+            truth = {row["id"] for row in exact}
+            if truth:
+                recalls.append(len(truth & {row["id"] for row in ann}) / len(truth))
+
+    print(f"samples: {len(samples)}, radius: {args.radius_km} km, k: {args.k}")
+    for name, values in latencies.items():
+        if values:
+            summarize(name, values)
+    if recalls:
+        print(f"ann recall@{args.k} (exact 기준): {statistics.mean(recalls):.4f}")
+    print(f"ann -> exact 재조회: {ann_fallbacks}/{len(samples)}")
+    print(f"auto 전략 선택: {auto_choices}")
+
+
+if __name__ == "__main__":
+    main()
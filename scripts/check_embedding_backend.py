@@ -0,0 +1,60 @@
+# 선택한 CPU 백엔드(onnx/quantized)의 임베딩이 torch 기준 임베딩과 코사인 기준으로 동등한지 확인
+#
+#   python -m scripts.check_embedding_backend --backend quantized --tolerance 0.98
+#
+# 최소 코사인 유사도가 tolerance 미만이면 종료 코드 1을 반환
+import argparse
+import sys
+import time
+import numpy as np
+from app.services.embedding_service import load_model
+
+SAMPLE_TEXTS = [
+    "카페; 스타벅스; 커피; 디저트",
+    "영화; CGV; 메가박스; 팝콘",
+    "편의점. 24시간 생활 편의 매장. 생활/편의",
+    "베이커리; 파리바게뜨; 뚜레쥬르; 케이크",
+    "패밀리 레스토랑. 스테이크와 파스타. 푸드",
+    "놀이공원; 에버랜드; 롯데월드; 액티비티",
+    "도서; 교보문고; 문구",
+    "뷰티; 올리브영; 화장품; 헤어",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="quantized", choices=["onnx", "quantized"])
+    parser.add_argument("--tolerance", type=float, default=0.98)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for backend in ("torch", args.backend):
+        # 비교 대상 백엔드를 로드하지 못하면 torch로 대체하지 않고 실패 (torch끼리 비교해서 통과하지 않도록)
+        model = load_model(backend, fallback=False)
+        vectors = model.encode(SAMPLE_TEXTS, convert_to_numpy=True, show_progress_bar=False)
+
+        # 요청 경로와 같은 단건 인코딩 지연시간 측정
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for text in SAMPLE_TEXTS:
+                model.encode(text, convert_to_numpy=True, show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / (args.repeat * len(SAMPLE_TEXTS))
+
+        results[backend] = (vectors, elapsed_ms)
+        print(f"{backend}: 단건 인코딩 평균 {elapsed_ms:.2f} ms")
+
+    base = results["torch"][0]
+    other = results[args.backend][0]
+    cosine = np.sum(base * other, axis=1) / (
+        np.linalg.norm(base, axis=1) * np.linalg.norm(other, axis=1)
+    )
+    print(f"코사인 유사도: min {cosine.min():.4f}, mean {cosine.mean():.4f}")
+
+    if cosine.min() < args.tolerance:
+        print(f"허용 오차 미달 (tolerance: {args.tolerance})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
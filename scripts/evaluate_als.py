@@ -0,0 +1,110 @@
+# ALS 상호작용 가중치 설정 오프라인 비교: 기존 방식(클릭 수) vs 환경변수 설정(신호 가중치 + 시간 감쇠)
+#
+#   python -m scripts.evaluate_als --holdout-days 7 --k 10
+#
+# cutoff 이전 상호작용으로 학습하고, cutoff 이후 상호작용한 브랜드를 정답으로 precision@k / recall@k 계산
+# 두 설정 모두 같은 사용자 집합(모든 설정의 학습 데이터에 있는 사용자)에서 평가하고,
+# 어느 설정이든 학습에 이미 있던 (사용자, 브랜드)는 추천 후보와 정답에서 모두 제외
+import argparse
+import numpy as np
+from datetime import datetime, timedelta
+from app.database.connection import SessionLocal
+from app.database.es import es
+from app.services.interactions import InteractionBuilder, InteractionConfig, build_user_item_matrix
+from app.services.recommend_service import fit_als
+
+EVAL_BLOCK_SIZE = 1024
+
+
+def build_ground_truth(user_ids: np.ndarray, brand_ids: np.ndarray) -> dict:
+    truth = {}
+    for user_id, brand_id in zip(user_ids.tolist(), brand_ids.tolist()):
+        truth.setdefault(user_id, set()).add(brand_id)
+    return truth
+
+
+def evaluate(name: str, builder: InteractionBuilder, train: tuple, truth: dict, seen: dict, k: int):
+    # truth: 평가 사용자 -> 정답 브랜드 (학습에서 본 브랜드는 이미 제외됨)
+    # seen: 사용자 -> 어느 설정이든 학습에서 본 브랜드 (모든 설정에 같은 마스크 적용)
+    matrix, unique_users, unique_brands = build_user_item_matrix(*train)
+    model = fit_als(matrix, builder)
+
+    eval_users = np.array(sorted(truth), dtype=np.int64)
+    codes = np.searchsorted(unique_users, eval_users)
+    k = min(k, len(unique_brands))
+
+    precisions, recalls = [], []
+    for start in range(0, len(codes), EVAL_BLOCK_SIZE):
+        block = codes[start:start + EVAL_BLOCK_SIZE]
+        scores = model.user_factors[block] @ model.item_factors.T
+        # 학습에서 본 브랜드는 점수를 -inf로 마스킹
+        for row, code in enumerate(block):
+            seen_brands = list(seen.get(int(unique_users[code]), ()))
+            scores[row, np.isin(unique_brands, seen_brands)] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        for row, code in enumerate(block):
+            relevant = truth[int(unique_users[code])]
+            recommended = set(unique_brands[top[row]].tolist())
+            hits = len(recommended & relevant)
+            precisions.append(hits / k)
+            recalls.append(hits / len(relevant))
+
+    if not precisions:
+        print(f"{name:>10}: 평가 가능한 사용자가 없습니다.")
+        return
+    print(
+        f"{name:>10}: users {len(precisions)}, "
+        f"precision@{k} {np.mean(precisions):.4f}, recall@{k} {np.mean(recalls):.4f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--holdout-days", type=int, default=7)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.holdout_days)
+    configs = {
+        "baseline": InteractionConfig.baseline(),
+        "weighted": InteractionConfig(),
+    }
+
+    with SessionLocal() as db:
+        # 정답은 설정과 무관하게 cutoff 이후 모든 신호의 (user, brand) 조합
+        test_builder = InteractionBuilder(InteractionConfig(
+            signal_weights={"store_click": 1.0, "brand_click": 1.0, "visit": 1.0, "bookmark": 1.0}
+        ))
+        test_users, test_brands, _ = test_builder.load(db, es, since=cutoff)
+        truth = build_ground_truth(test_users, test_brands)
+        print(f"cutoff: {cutoff.isoformat()}, 테스트 사용자 {len(truth)}명")
+
+        trains = {}
+        for name, config in configs.items():
+            builder = InteractionBuilder(config)
+            train = builder.load(db, es, until=cutoff)
+            if len(train[0]) == 0:
+                print(f"{name:>10}: 학습 데이터가 없습니다.")
+                return
+            trains[name] = (builder, train)
+
+    # 설정마다 학습 사용자 수가 다르므로(방문/즐겨찾기 포함 여부) 모든 설정에 있는 사용자만 평가
+    eval_users = set(truth)
+    for _, (user_ids, _, _) in trains.values():
+        eval_users &= set(user_ids.tolist())
+    seen = build_ground_truth(
+        np.concatenate([train[0] for _, train in trains.values()]),
+        np.concatenate([train[1] for _, train in trains.values()])
+    )
+    # 학습에서 이미 본 브랜드는 모든 설정에서 마스킹되므로 정답에서도 제외
+    truth = {user_id: truth[user_id] - seen.get(user_id, set()) for user_id in eval_users}
+    truth = {user_id: brands for user_id, brands in truth.items() if brands}
+    print(f"공통 평가 사용자 {len(truth)}명")
+
+    for name, (builder, train) in trains.items():
+        print(f"{name:>10}: {configs[name]}")
+        evaluate(name, builder, train, truth, seen, args.k)
+
+if __name__ == "__main__":
+    main()